@@ -0,0 +1,235 @@
+# bench/bench_filters.py
+# Filter hot path + persistence benchmark (fake bot, synthetic groups)।
+#
+#   python bench/bench_filters.py --sizes 10,1000,10000,100000 --messages 5000 --out bench.json
+#
+# মাপা হয়:
+#   guard       : _filter_guard messages/sec, p50/p99 latency (text + caption, বাংলা/English)
+#   filter_cmd  : /filter এবং /delfilter (add_filters / remove_filters + db) latency
+#   save_group  : db.save_group blob write latency
+#   cold_start  : নতুন process-এ `import state` + প্রথম group load (বড় SQLite ফাইল)
+# ফলাফল JSON (--out) এ সেভ হয়, রান-টু-রান তুলনার জন্য।
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace as NS
+
+ROOT = Path(__file__).resolve().parent.parent
+
+BN_WORDS = ["আমি", "তুমি", "ভাই", "দাম", "লিংক", "গ্রুপ", "নিয়ম", "ভিডিও", "আপডেট", "অফার",
+            "কেমন", "আছেন", "ধন্যবাদ", "সকাল", "রাত", "খবর", "টাকা", "বই", "গান", "খেলা"]
+EN_WORDS = ["hello", "price", "link", "group", "rules", "video", "update", "offer", "join",
+            "admin", "help", "free", "movie", "song", "game", "news", "money", "book", "please", "thanks"]
+
+
+def percentile(xs, p):
+    if not xs:
+        return 0.0
+    xs = sorted(xs)
+    k = min(len(xs) - 1, max(0, int(round(p / 100.0 * (len(xs) - 1)))))
+    return xs[k]
+
+
+def summarize(lat_s):
+    total = sum(lat_s)
+    return {
+        "n": len(lat_s),
+        "per_sec": round(len(lat_s) / total, 1) if total else 0.0,
+        "p50_us": round(percentile(lat_s, 50) * 1e6, 1),
+        "p99_us": round(percentile(lat_s, 99) * 1e6, 1),
+        "max_us": round(max(lat_s) * 1e6, 1) if lat_s else 0.0,
+    }
+
+
+class FakeBot:
+    """Records telebot-level handlers by function name; send calls only counted."""
+    def __init__(self):
+        self.handlers = {}
+        self.calls = 0
+
+    def _deco(self, *a, **kw):
+        def deco(fn):
+            self.handlers[fn.__name__] = fn
+            return fn
+        return deco
+
+    message_handler = callback_query_handler = chat_member_handler = my_chat_member_handler = _deco
+
+    def __getattr__(self, name):
+        def call(*a, **kw):
+            self.calls += 1
+            return NS(username="bench_bot", message_id=1, title="Bench", status="member")
+        return call
+
+
+def make_triggers(n, rnd):
+    out, seen = [], set()
+    words = BN_WORDS + EN_WORDS
+    while len(out) < n:
+        t = rnd.choice(words) + (str(len(out)) if len(out) >= len(words) else "")
+        if t not in seen:
+            seen.add(t); out.append(t)
+    return out
+
+
+def make_message(gid, rnd, triggers, hit_ratio, caption=False):
+    words = [rnd.choice(BN_WORDS + EN_WORDS) + "x" for _ in range(rnd.randint(3, 25))]
+    if rnd.random() < hit_ratio:
+        words.insert(rnd.randrange(len(words) + 1), rnd.choice(triggers))
+    text = " ".join(words)
+    uid = rnd.randint(1, 10 ** 6)
+    return NS(
+        text=None if caption else text, caption=text if caption else None,
+        chat=NS(id=gid, type="supergroup", title=f"Bench {gid}"),
+        from_user=NS(id=uid, first_name=f"U{uid}", last_name=None, username=None, language_code="bn"),
+        reply_to_message=None, message_id=rnd.randint(1, 10 ** 9), content_type="text",
+    )
+
+
+def seed_group(gid, triggers):
+    from state import save_filters
+    resp = {"text": "হ্যালো {MENTION}, {GROUPNAME}-এ স্বাগতম!", "buttons": [[["Rules", "https://t.me/"]]], "is_html": True}
+    save_filters(gid, {t: resp for t in triggers}, ())
+
+
+def bench_guard(h, gid, triggers, n_msgs, hit_ratio, rnd):
+    from state import GROUP_SETTINGS
+    GROUP_SETTINGS[gid]          # warm load
+    guard = h["_filter_guard"]
+    msgs = [make_message(gid, rnd, triggers, hit_ratio, caption=(i % 5 == 0)) for i in range(n_msgs)]
+    guard(msgs[0])               # build matcher (measured separately)
+    lat = []
+    pc = time.perf_counter
+    for m in msgs:
+        t0 = pc(); guard(m); lat.append(pc() - t0)
+    return summarize(lat)
+
+
+def bench_matcher_build(gid, triggers):
+    from modules import filters as F
+    F._MATCHERS.pop(gid, None)
+    t0 = time.perf_counter()
+    F.filters_snapshot(gid)
+    return round((time.perf_counter() - t0) * 1000, 2)
+
+
+def bench_filter_cmds(h, gid, n_ops, rnd):
+    add, dele = [], []
+    for i in range(n_ops):
+        trg = f"benchtrg{i}_{rnd.randint(0, 10 ** 6)}"
+        m = make_message(gid, rnd, [trg], 0)
+        m.text = f"/filter {trg} নতুন উত্তর {i}"
+        t0 = time.perf_counter(); h["cmd_filter"](m); add.append(time.perf_counter() - t0)
+        m.text = f"/delfilter {trg}"
+        t0 = time.perf_counter(); h["cmd_delfilter"](m); dele.append(time.perf_counter() - t0)
+    return {"filter": summarize(add), "delfilter": summarize(dele)}
+
+
+def bench_save_group(gid, n_ops):
+    import db
+    from state import GROUP_SETTINGS
+    data = GROUP_SETTINGS[gid]
+    lat = []
+    for _ in range(n_ops):
+        t0 = time.perf_counter(); db.save_group(gid, data); lat.append(time.perf_counter() - t0)
+    return summarize(lat)
+
+
+def bench_cold_start(groups, filters_per_group, rnd):
+    d = tempfile.mkdtemp(prefix="bench_cold_")
+    env = dict(os.environ, BOT_DATA_DIR=d)
+    seed = (
+        "import random, db, json\n"
+        "db.init_db()\n"
+        f"rnd = random.Random(7); G = {groups}; F = {filters_per_group}\n"
+        "resp = {'text': 'উত্তর {MENTION}', 'buttons': [], 'is_html': True}\n"
+        "with db.conn_ctx() as con:\n"
+        "    con.executemany('INSERT OR REPLACE INTO groups(gid, data) VALUES(?, ?)',\n"
+        "        [(-100 - g, json.dumps({'antispam': True, 'welcome_cfg': {'enabled': True, 'text': 'x' * 200}})) for g in range(G)])\n"
+        "for g in range(G):\n"
+        "    with db.conn_ctx() as con:\n"
+        "        db._write_filters(con, -100 - g, {f't{g}_{i}': resp for i in range(F)}, ())\n"
+    )
+    subprocess.run([sys.executable, "-c", seed], cwd=ROOT, env=env, check=True)
+    probe = (
+        "import time; t0 = time.perf_counter()\n"
+        "import state\n"
+        "t1 = time.perf_counter(); state.GROUP_SETTINGS[-100]; t2 = time.perf_counter()\n"
+        "print(t1 - t0, t2 - t1)\n"
+    )
+    runs = []
+    for _ in range(3):
+        out = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, env=env,
+                             check=True, capture_output=True, text=True).stdout.split()
+        runs.append((float(out[0]), float(out[1])))
+    size = sum(p.stat().st_size for p in Path(d).glob("bot.sqlite3*"))
+    return {
+        "groups": groups, "filters_per_group": filters_per_group, "db_bytes": size,
+        "import_state_ms": round(min(r[0] for r in runs) * 1000, 2),
+        "first_group_ms": round(min(r[1] for r in runs) * 1000, 2),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="10,1000,10000,100000", help="triggers per group")
+    ap.add_argument("--messages", type=int, default=5000)
+    ap.add_argument("--hit-ratio", type=float, default=0.3)
+    ap.add_argument("--write-ops", type=int, default=200)
+    ap.add_argument("--cold-groups", type=int, default=2000)
+    ap.add_argument("--cold-filters", type=int, default=50)
+    ap.add_argument("--out", default="bench_results.json")
+    ap.add_argument("--seed", type=int, default=42)
+    a = ap.parse_args()
+
+    os.environ.setdefault("BOT_DATA_DIR", tempfile.mkdtemp(prefix="bench_"))
+    os.environ.setdefault("BOT_FILTER_COOLDOWN", "0")   # hot path মাপছি, cooldown নয়
+    sys.path.insert(0, str(ROOT))
+    from modules import filters as F
+
+    rnd = random.Random(a.seed)
+    bot = FakeBot()
+    F.register(bot)
+    from router import get_router
+    h = get_router(bot).handlers()
+
+    results = {
+        "meta": {"ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                 "platform": platform.platform(), "args": vars(a)},
+        "groups": [],
+    }
+    for i, size in enumerate(int(x) for x in a.sizes.split(",") if x):
+        gid = -1000000 - i
+        triggers = make_triggers(size, rnd)
+        t0 = time.perf_counter(); seed_group(gid, triggers); seed_ms = (time.perf_counter() - t0) * 1000
+        row = {
+            "triggers": size,
+            "seed_ms": round(seed_ms, 2),
+            "matcher_build_ms": bench_matcher_build(gid, triggers),
+            "guard": bench_guard(h, gid, triggers, a.messages, a.hit_ratio, rnd),
+            "filter_cmd": bench_filter_cmds(h, gid, a.write_ops, rnd),
+            "save_group": bench_save_group(gid, a.write_ops),
+        }
+        results["groups"].append(row)
+        g = row["guard"]
+        print(f"{size:>7} triggers | guard {g['per_sec']:>9} msg/s p50 {g['p50_us']}us p99 {g['p99_us']}us"
+              f" | /filter p50 {row['filter_cmd']['filter']['p50_us']}us"
+              f" | /delfilter p50 {row['filter_cmd']['delfilter']['p50_us']}us", flush=True)
+
+    if a.cold_groups > 0:
+        results["cold_start"] = bench_cold_start(a.cold_groups, a.cold_filters, rnd)
+        print("cold start:", results["cold_start"])
+
+    Path(a.out).write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    print("saved", a.out)
+
+
+if __name__ == "__main__":
+    main()
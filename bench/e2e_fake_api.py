@@ -0,0 +1,110 @@
+# bench/e2e_fake_api.py
+# End-to-end: main.py (outbox চালু, default) vs bench/fake_bot_api.py, polling আর webhook দুই mode-এ।
+# প্রতিটা chat-এ একটা filter seed করি, তারপর fake API-র /stats-এ reply গুনে expected-এর সাথে মিলাই।
+#
+#   python bench/e2e_fake_api.py --updates 300 --chats 20
+#   python bench/e2e_fake_api.py --modes webhook
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from fake_bot_api import make_updates   # noqa: E402
+
+TRIGGER = "rules"
+API_PORT = 8081
+WEBHOOK_PORT = 8443
+
+
+def _wait_port(port: int, timeout: float = 20) -> None:
+    end = time.time() + timeout
+    while time.time() < end:
+        with socket.socket() as s:
+            if s.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f"port {port} did not open")
+
+
+def _stats() -> dict:
+    with urllib.request.urlopen(f"http://127.0.0.1:{API_PORT}/stats", timeout=5) as r:
+        return json.load(r)
+
+
+def _seed(data_dir: str, chat_ids) -> None:
+    code = (
+        "import db; db.init_db()\n"
+        f"for gid in {sorted(chat_ids)!r}:\n"
+        f"    db.save_filters(gid, {{{TRIGGER!r}: {{'text': 'see pinned', 'buttons': [], 'is_html': True}}}})\n"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True,
+                   env=dict(os.environ, BOT_DATA_DIR=data_dir))
+
+
+def run_mode(mode: str, n: int, chats: int, timeout: float) -> dict:
+    updates = make_updates(n, chats)
+    expected = sum(TRIGGER in u["message"]["text"].split() for u in updates)
+    data_dir = tempfile.mkdtemp(prefix=f"e2e_{mode}_")
+    _seed(data_dir, {u["message"]["chat"]["id"] for u in updates})
+    env = dict(os.environ, BOT_TOKEN="1:e2e", BOT_DATA_DIR=data_dir, BOT_MODE=mode,
+               BOT_API_URL=f"http://127.0.0.1:{API_PORT}/bot{{0}}/{{1}}",
+               BOT_WEBHOOK_HOST="127.0.0.1", BOT_WEBHOOK_PORT=str(WEBHOOK_PORT),
+               BOT_FILTER_COOLDOWN="0", BOT_GROUP_RATE_PER_MIN="6000")
+    env.pop("BOT_OUTBOX", None)          # outbox path (default) চাই
+    fake_cmd = [sys.executable, str(ROOT / "bench" / "fake_bot_api.py"), "--port", str(API_PORT),
+                "--updates", str(n), "--chats", str(chats)]
+    procs = []
+    try:
+        if mode == "webhook":
+            # webhook-এ fake API চালু হওয়ামাত্র POST করে, তাই আগে bot
+            procs.append(subprocess.Popen([sys.executable, "main.py"], cwd=ROOT, env=env))
+            _wait_port(WEBHOOK_PORT)
+            fake_cmd += ["--webhook", f"http://127.0.0.1:{WEBHOOK_PORT}/webhook"]
+            procs.append(subprocess.Popen(fake_cmd, stdout=subprocess.DEVNULL))
+            _wait_port(API_PORT)
+        else:
+            procs.append(subprocess.Popen(fake_cmd, stdout=subprocess.DEVNULL))
+            _wait_port(API_PORT)
+            procs.append(subprocess.Popen([sys.executable, "main.py"], cwd=ROOT, env=env))
+        end = time.time() + timeout
+        st = _stats()
+        while time.time() < end and st["replies"] < expected:
+            time.sleep(0.25)
+            st = _stats()
+        time.sleep(0.5)                  # বাড়তি reply (ডুপ্লিকেট) ধরতে
+        st = _stats()
+    finally:
+        for p in reversed(procs):
+            p.terminate()
+        for p in procs:
+            try:
+                p.wait(10)
+            except subprocess.TimeoutExpired:
+                p.kill()
+    return {"mode": mode, "updates": n, "expected": expected, "replies": st["replies"],
+            "ok": st["replies"] == expected}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--updates", type=int, default=300)
+    ap.add_argument("--chats", type=int, default=20)
+    ap.add_argument("--modes", default="polling,webhook")
+    ap.add_argument("--timeout", type=float, default=30)
+    a = ap.parse_args()
+    results = [run_mode(m.strip(), a.updates, a.chats, a.timeout) for m in a.modes.split(",") if m.strip()]
+    for r in results:
+        print(json.dumps(r))
+    sys.exit(0 if all(r["ok"] for r in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
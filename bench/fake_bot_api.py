@@ -0,0 +1,161 @@
+# bench/fake_bot_api.py
+# Local fake Telegram Bot API — polling / webhook mode-এ updates/sec মাপার জন্য।
+#
+#   python bench/fake_bot_api.py --updates 20000 --chats 50
+#   BOT_API_URL=http://127.0.0.1:8081/bot{0}/{1} python main.py                 # polling
+#   BOT_MODE=webhook BOT_API_URL=... python main.py &
+#   python bench/fake_bot_api.py --updates 20000 --webhook http://127.0.0.1:8443/webhook
+#
+# getUpdates synthetic group messages দেয় (webhook mode-এ POST করে), send*/reply কল গুনে
+# GET /stats এ JSON দেয়: served, replies, api_calls, elapsed, replies_per_sec
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+
+from aiohttp import ClientSession, web
+
+TEXTS = [
+    "hello everyone", "কেমন আছেন সবাই", "price koto?", "আজকের আপডেট কী",
+    "where is the link", "ধন্যবাদ ভাই", "rules please", "admin ke?",
+    "good morning", "শুভ সকাল", "how to join", "ভিডিওটা দেখেন",
+]
+
+
+def make_updates(n: int, chats: int, seed: int = 1):
+    rnd = random.Random(seed)
+    now = int(time.time())
+    out = []
+    for i in range(1, n + 1):
+        cid = -1000000000000 - rnd.randrange(chats)
+        uid = 1000 + rnd.randrange(5000)
+        out.append({
+            "update_id": i,
+            "message": {
+                "message_id": i, "date": now,
+                "chat": {"id": cid, "type": "supergroup", "title": f"Group {cid}"},
+                "from": {"id": uid, "is_bot": False, "first_name": f"U{uid}"},
+                "text": rnd.choice(TEXTS),
+            },
+        })
+    return out
+
+
+class FakeApi:
+    def __init__(self, updates):
+        self.updates = updates
+        self.calls: dict = {}
+        self.replies = 0
+        self.served = 0
+        self.t_first = None
+        self.t_last = None
+        self._msg_id = itertools.count(10 ** 6)
+
+    def _message(self, chat_id, text=""):
+        try:
+            chat_id = int(chat_id)
+        except (TypeError, ValueError):
+            chat_id = 0
+        return {"message_id": next(self._msg_id), "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "supergroup"}, "text": text or ""}
+
+    async def handle(self, request):
+        method = request.match_info["method"]
+        params = dict(request.query)
+        if request.can_read_body:
+            if request.content_type == "application/json":
+                params.update(await request.json())
+            else:
+                params.update(await request.post())
+        self.calls[method] = self.calls.get(method, 0) + 1
+        result = True
+        if method == "getUpdates":
+            result = await self._get_updates(params)
+        elif method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+        elif method == "getChat":
+            cid = int(params.get("chat_id", 0))
+            result = {"id": cid, "type": "supergroup", "title": f"Group {cid}"}
+        elif method == "getChatMember":
+            result = {"status": "member",
+                      "user": {"id": int(params.get("user_id", 0)), "is_bot": False, "first_name": "U"}}
+        elif method.startswith("send") or method == "editMessageText":
+            self.replies += 1
+            self.t_last = time.perf_counter()
+            result = self._message(params.get("chat_id"), params.get("text"))
+        return web.json_response({"ok": True, "result": result})
+
+    async def _get_updates(self, params):
+        offset = int(params.get("offset") or 1)
+        limit = int(params.get("limit") or 100)
+        batch = self.updates[offset - 1: offset - 1 + limit]
+        if not batch:
+            await asyncio.sleep(min(float(params.get("timeout") or 0), 1.0))
+            return []
+        self._mark_served(len(batch))
+        return batch
+
+    def _mark_served(self, n):
+        if self.t_first is None:
+            self.t_first = time.perf_counter()
+        self.served += n
+
+    async def stats(self, request):
+        return web.json_response(self.snapshot())
+
+    def snapshot(self):
+        elapsed = (self.t_last - self.t_first) if (self.t_first and self.t_last) else 0.0
+        return {"served": self.served, "replies": self.replies, "api_calls": self.calls,
+                "elapsed": round(elapsed, 4),
+                "replies_per_sec": round(self.replies / elapsed, 1) if elapsed else 0.0}
+
+
+async def push_webhook(api: FakeApi, url: str, concurrency: int):
+    sem = asyncio.Semaphore(concurrency)
+    async with ClientSession() as s:
+        async def post(u):
+            async with sem:
+                async with s.post(url, json=u) as r:
+                    await r.read()
+        api._mark_served(0)
+        await asyncio.gather(*(post(u) for u in api.updates))
+        api.served = len(api.updates)
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8081)
+    ap.add_argument("--updates", type=int, default=10000)
+    ap.add_argument("--chats", type=int, default=50)
+    ap.add_argument("--webhook", help="POST updates here instead of serving getUpdates")
+    ap.add_argument("--concurrency", type=int, default=64)
+    a = ap.parse_args()
+
+    updates = make_updates(a.updates, a.chats)
+    api = FakeApi(updates)
+    app = web.Application()
+    app.router.add_route("*", "/bot{token}/{method}", api.handle)
+    app.router.add_get("/stats", api.stats)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, a.host, a.port).start()
+    print(f"fake Bot API on http://{a.host}:{a.port}/bot{{0}}/{{1}}")
+
+    if a.webhook:
+        await push_webhook(api, a.webhook, a.concurrency)
+    try:
+        while True:
+            await asyncio.sleep(5)
+            print(json.dumps(api.snapshot(), ensure_ascii=False))
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
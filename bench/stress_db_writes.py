@@ -0,0 +1,61 @@
+# bench/stress_db_writes.py
+# Concurrent write regression: কয়েকটা thread একসাথে save_filters / import_filters / save_group চালায়
+# (প্রতিটা নিজের group-এ, আলাদা content)। worker pool / supervisor-এর মতো load-এ
+# "database is locked" (deferred transaction-এ read -> write upgrade, SQLITE_BUSY_SNAPSHOT) ধরা পড়ে।
+#
+#   python bench/stress_db_writes.py --threads 4 --ops 400
+#
+# কোনো call ব্যর্থ হলে exit code 1।
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, default=4)
+    ap.add_argument("--ops", type=int, default=400, help="calls per thread")
+    a = ap.parse_args()
+
+    os.environ["BOT_DATA_DIR"] = tempfile.mkdtemp(prefix="stress_db_")
+    sys.path.insert(0, str(ROOT))
+    import db
+    db.init_db()
+
+    errors: dict = {}
+    lock = threading.Lock()
+
+    def worker(i: int):
+        gid = -1000 - i
+        for k in range(a.ops):
+            try:
+                if k % 10 == 9:
+                    db.import_filters(gid, ((f"imp{i}_{k}_{j}", {"text": f"{i}:{k}:{j}"}) for j in range(50)))
+                elif k % 10 == 8:
+                    db.save_group(gid, {"night": k % 2 == 0})
+                else:
+                    db.save_filters(gid, {f"t{k % 20}": {"text": f"{i}:{k}"}}, [f"t{(k + 7) % 20}"])
+            except Exception as e:
+                with lock:
+                    errors[repr(e)] = errors.get(repr(e), 0) + 1
+        db.close_conn()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(a.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    calls = a.threads * a.ops
+    print(json.dumps({"threads": a.threads, "calls": calls,
+                      "failed": sum(errors.values()), "errors": errors}, ensure_ascii=False))
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+# cache.py
+# ছোট in-memory cache helpers (thread-safe)
+from __future__ import annotations
+import math
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from itertools import islice
+from typing import Any, Callable, Hashable
+
+MISSING = object()
+
+
+class LRUCache:
+    """
+    Size-bounded LRU (by entry count) with hit / miss / eviction counters.
+    maxsize <= 0 -> unbounded.
+    """
+    def __init__(self, maxsize: int):
+        self.maxsize = int(maxsize)
+        self._d: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            v = self._d.get(key, MISSING)
+            if v is MISSING:
+                self.misses += 1
+                return default
+            self._d.move_to_end(key)
+            self.hits += 1
+            return v
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Read without touching LRU order or counters."""
+        return self._d.get(key, default)
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self._store(key, value, True)
+
+    def add(self, key: Hashable, value: Any) -> bool:
+        """put() only if key is absent (warm-up must not clobber live entries)."""
+        return self._store(key, value, False)
+
+    def _store(self, key: Hashable, value: Any, replace: bool) -> bool:
+        with self._lock:
+            if not replace and key in self._d:
+                return False
+            self._d[key] = value
+            self._d.move_to_end(key)
+            if self.maxsize > 0:
+                while len(self._d) > self.maxsize:
+                    self._d.popitem(last=False)
+                    self.evictions += 1
+            return True
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            return self._d.pop(key, default)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._d.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._d
+
+    def __len__(self) -> int:
+        return len(self._d)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._d))
+
+    def stats(self) -> dict:
+        return {"size": len(self._d), "maxsize": self.maxsize,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class TTLCache(LRUCache):
+    """
+    LRUCache whose entries expire after ttl seconds (per-entry override allowed).
+    Expired entries count as misses and are dropped on access.
+    sliding=True: a hit pushes the expiry to now + ttl (idle timeout, not age).
+    """
+    def __init__(self, maxsize: int, ttl: float, sliding: bool = False):
+        super().__init__(maxsize)
+        self.ttl = float(ttl)
+        self.sliding = sliding
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        ent = super().get(key, MISSING)
+        if ent is MISSING:
+            return default
+        expires, value = ent
+        now = time.monotonic()
+        if expires < now:
+            with self._lock:
+                if self._d.get(key) is ent:
+                    del self._d[key]
+                self.hits -= 1
+                self.misses += 1
+            return default
+        if self.sliding:
+            with self._lock:
+                if self._d.get(key) is ent:
+                    self._d[key] = (now + self.ttl, value)
+        return value
+
+    def put(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        super().put(key, (time.monotonic() + (self.ttl if ttl is None else ttl), value))
+
+    def add(self, key: Hashable, value: Any, ttl: float | None = None) -> bool:
+        return super().add(key, (time.monotonic() + (self.ttl if ttl is None else ttl), value))
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        ent = super().pop(key, MISSING)
+        return default if ent is MISSING else ent[1]
+
+    def sweep(self, budget: int = 256) -> int:
+        """Drop expired entries from the LRU end, at most `budget` looked at. Returns removed."""
+        now = time.monotonic()
+        removed = 0
+        with self._lock:
+            for key in list(islice(self._d, budget)):
+                if self._d[key][0] < now:
+                    del self._d[key]
+                    removed += 1
+        return removed
+
+
+class ExpiringDict(MutableMapping):
+    """
+    dict-এর মতো API, কিন্তু TTL + size cap (ephemeral state-এর জন্য)।
+    factory দিলে missing key-তে নতুন value তৈরি হয় (defaultdict-এর মতো)।
+    প্রতি SWEEP_EVERY write-এ ছোট একটা sweep: আলাদা thread লাগে না।
+    sliding=True হলে প্রতিটা read-ও TTL নতুন করে (in-place বদলানো value-র জন্য, যেমন UserSet)।
+    """
+    SWEEP_EVERY = 256
+
+    def __init__(self, maxsize: int, ttl: float, factory: Callable[[], Any] | None = None,
+                 sliding: bool = False):
+        self._c = TTLCache(maxsize, ttl, sliding)
+        self._factory = factory
+        self._writes = 0
+
+    def __getitem__(self, key):
+        v = self._c.get(key, MISSING)
+        if v is MISSING:
+            if self._factory is None:
+                raise KeyError(key)
+            v = self._factory()
+            self[key] = v
+        return v
+
+    def __setitem__(self, key, value) -> None:
+        self._c.put(key, value)
+        self._writes += 1
+        if self._writes % self.SWEEP_EVERY == 0:
+            self._c.sweep()
+
+    def __delitem__(self, key) -> None:
+        if self._c.pop(key, MISSING) is MISSING:
+            raise KeyError(key)
+
+    def __contains__(self, key) -> bool:
+        return self._c.get(key, MISSING) is not MISSING
+
+    def get(self, key, default=None):
+        v = self._c.get(key, MISSING)
+        return default if v is MISSING else v
+
+    def __iter__(self):
+        now = time.monotonic()
+        return iter([k for k in self._c if (self._c.peek(k) or (0,))[0] >= now])
+
+    def __len__(self) -> int:
+        return len(self._c)             # expired-কিন্তু-এখনো-sweep-হয়নি entry সহ
+
+    def values_raw(self):
+        """Live values without touching LRU order (memory report)."""
+        for k in self._c:
+            ent = self._c.peek(k)
+            if ent is not None:
+                yield ent[1]
+
+    def stats(self) -> dict:
+        return self._c.stats()
+
+
+# ---------- compact per-chat user id sets ----------
+class BloomFilter:
+    """Fixed-size Bloom filter over int ids (false positive ~error at capacity)."""
+    __slots__ = ("m", "k", "bits", "count")
+
+    def __init__(self, capacity: int, error: float = 0.01):
+        self.m = max(64, int(math.ceil(-capacity * math.log(error) / (math.log(2) ** 2))))
+        self.k = max(1, int(round(self.m / capacity * math.log(2))))
+        self.bits = bytearray((self.m + 7) // 8)
+        self.count = 0
+
+    def _idx(self, x: int):
+        h1 = (x * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        h2 = ((x ^ (x >> 31)) * 0xBF58476D1CE4E5B9 | 1) & 0xFFFFFFFFFFFFFFFF
+        m = self.m
+        return [(h1 + i * h2) % m for i in range(self.k)]
+
+    def add(self, x: int) -> None:
+        b = self.bits
+        for i in self._idx(int(x)):
+            b[i >> 3] |= 1 << (i & 7)
+        self.count += 1
+
+    def __contains__(self, x) -> bool:
+        b = self.bits
+        return all(b[i >> 3] & (1 << (i & 7)) for i in self._idx(int(x)))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def nbytes(self) -> int:
+        return sys.getsizeof(self.bits)
+
+
+class UserSet:
+    """
+    int64 id-র compact set: sorted array('q') (8 byte/id, set-এর ~60+ byte/id-এর বদলে)।
+    bloom_at > 0: এর বেশি id হলে BloomFilter-এ বদলায় (মেমরি fixed, সামান্য false positive)।
+    """
+    __slots__ = ("_a", "_bloom", "bloom_at", "bloom_capacity")
+
+    def __init__(self, bloom_at: int = 0, bloom_capacity: int = 200000):
+        self._a = array("q")
+        self._bloom: BloomFilter | None = None
+        self.bloom_at = bloom_at
+        self.bloom_capacity = bloom_capacity
+
+    def add(self, x: int) -> None:
+        x = int(x)
+        if self._bloom is not None:
+            self._bloom.add(x)
+            return
+        a = self._a
+        i = bisect_left(a, x)
+        if i < len(a) and a[i] == x:
+            return
+        a.insert(i, x)
+        if self.bloom_at and len(a) > self.bloom_at:
+            bf = BloomFilter(max(self.bloom_capacity, len(a) * 2))
+            for v in a:
+                bf.add(v)
+            self._bloom, self._a = bf, array("q")
+
+    def discard(self, x: int) -> None:
+        if self._bloom is not None:
+            return                      # Bloom থেকে মোছা যায় না
+        a = self._a
+        i = bisect_left(a, int(x))
+        if i < len(a) and a[i] == int(x):
+            del a[i]
+
+    def __contains__(self, x) -> bool:
+        if self._bloom is not None:
+            return x in self._bloom
+        a = self._a
+        i = bisect_left(a, int(x))
+        return i < len(a) and a[i] == int(x)
+
+    def __len__(self) -> int:
+        return len(self._bloom) if self._bloom is not None else len(self._a)
+
+    def __iter__(self):
+        return iter(self._a)           # Bloom mode-এ id আর enumerate করা যায় না
+
+    def nbytes(self) -> int:
+        if self._bloom is not None:
+            return self._bloom.nbytes()
+        return sys.getsizeof(self._a)
@@ -1,10 +1,15 @@
 # db.py
 import os
 import json
+import hashlib
 import sqlite3
+import threading
 from contextlib import contextmanager
 from pathlib import Path
 
+from metrics import timed
+from settings import sparse
+
 # ---- DB path (persistent) ----
 # Prefer explicit env var; else create ./data/bot.sqlite3 next to this file
 APP_ROOT = Path(__file__).resolve().parent
@@ -13,16 +18,81 @@ os.makedirs(DATA_DIR, exist_ok=True)
 
 DB_PATH = str(Path(DATA_DIR) / "bot.sqlite3")
 
+# ---- connection manager ----
+# Default: one long-lived tuned connection per thread (WAL, synchronous=NORMAL,
+# statement cache reuse). BOT_DB_PERSISTENT=0 -> পুরনো আচরণ: প্রতি কলে connect/commit/close
+DB_PERSISTENT = os.environ.get("BOT_DB_PERSISTENT", "1") != "0"
+DB_CACHE_KB = int(os.environ.get("BOT_DB_CACHE_KB", "16384"))
+DB_MMAP_MB = int(os.environ.get("BOT_DB_MMAP_MB", "128"))
+
+# ---- cross-process change log (BOT_PROCESSES > 1, দেখুন supervisor.py) ----
+# প্রতিটা group / user_groups write একই transaction-এ change_log-এ (kind, key, pid) লেখে;
+# অন্য worker process PRAGMA data_version বদলালে নতুন row পড়ে নিজের cache থেকে key ফেলে দেয়
+CHANGE_LOG = int(os.environ.get("BOT_PROCESSES", "1")) > 1
+CHANGE_LOG_KEEP = 10000
+
+_local = threading.local()
+
+def _connect() -> sqlite3.Connection:
+    if not DB_PERSISTENT:
+        con = sqlite3.connect(DB_PATH, check_same_thread=False)
+        con.row_factory = sqlite3.Row
+        return con
+    con = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=256)
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.execute(f"PRAGMA cache_size=-{DB_CACHE_KB}")
+    con.execute(f"PRAGMA mmap_size={DB_MMAP_MB * 1024 * 1024}")
+    con.execute("PRAGMA busy_timeout=5000")
+    return con
+
 @contextmanager
-def conn_ctx():
-    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+def conn_ctx(readonly: bool = False):
+    """
+    readonly=True: commit skip (SELECT-only helpers).
+    Persistent mode: commit on success, rollback on error, connection stays open.
+    """
+    if not DB_PERSISTENT:
+        con = _connect()
+        try:
+            yield con
+        finally:
+            con.commit()
+            con.close()
+        return
+    con = getattr(_local, "con", None)
+    if con is None:
+        con = _local.con = _connect()
     try:
-        con.row_factory = sqlite3.Row
         yield con
-    finally:
-        con.commit()
+    except BaseException:
+        if con.in_transaction:
+            con.rollback()
+        raise
+    else:
+        if not readonly and con.in_transaction:
+            con.commit()
+
+@contextmanager
+def write_txn(con: sqlite3.Connection):
+    """
+    BEGIN IMMEDIATE ... COMMIT (error হলে rollback).
+    SELECT-তারপর-write transaction-এর জন্য: write lock আগেই নিই, কারণ deferred
+    transaction-এ read snapshot থেকে write-এ upgrade SQLITE_BUSY_SNAPSHOT দেয়, busy_timeout সেটা retry করে না।
+    """
+    con.execute("BEGIN IMMEDIATE")
+    with con:
+        yield con
+
+def close_conn():
+    """Close this thread's persistent connection (shutdown / thread exit)."""
+    con = getattr(_local, "con", None)
+    if con is not None:
+        _local.con = None
         con.close()
 
+@timed("db_seconds", op="init_db")
 def init_db():
     with conn_ctx() as con:
         cur = con.cursor()
@@ -42,6 +112,8 @@ def init_db():
             PRIMARY KEY (user_id, gid)
         )
         """)
+        # gid -> users (title update / bot removed) without a full scan
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_user_groups_gid ON user_groups(gid)")
         # pm_targets: user's last-selected group for PM filter management
         cur.execute("""
         CREATE TABLE IF NOT EXISTS pm_targets (
@@ -49,23 +121,181 @@ def init_db():
             group_id INTEGER NOT NULL
         )
         """)
+        # filter_responses: reply payload {"text","buttons","is_html"} as JSON,
+        # content-addressed (hash = blake2b of the canonical JSON), refs = filters rows pointing here
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS filter_responses (
+            id      INTEGER PRIMARY KEY AUTOINCREMENT,
+            data    TEXT NOT NULL,
+            hash    BLOB,
+            refs    INTEGER NOT NULL DEFAULT 0
+        )
+        """)
+        # filters: one row per trigger; rowid order = insertion order (first match wins)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS filters (
+            gid         INTEGER NOT NULL,
+            trigger     TEXT NOT NULL,
+            response_id INTEGER NOT NULL,
+            PRIMARY KEY (gid, trigger)
+        )
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_filters_response ON filters(response_id)")
+        # change_log: kind 'g' = group gid, 'u' = user_id's user_groups, 't' = gid title,
+        # 'p' = user_id's pm_targets row, 'm' = gid's linked users
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq     INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind    TEXT NOT NULL,
+            key     INTEGER NOT NULL,
+            pid     INTEGER NOT NULL
+        )
+        """)
         con.commit()
+        _migrate(con)
+
+# ---------- schema migrations (PRAGMA user_version) ----------
+SCHEMA_VERSION = 4
+
+def _migrate(con):
+    ver = con.execute("PRAGMA user_version").fetchone()[0]
+    if ver >= SCHEMA_VERSION:
+        return
+    with con:
+        if ver < 2:
+            _add_response_columns(con)      # v1-এর _write_filters-ও hash কলাম চায়
+        if ver < 1:
+            _migrate_filters_blobs(con)
+        if ver < 2:
+            _migrate_response_hashes(con)
+        if ver < 3:
+            _migrate_pm_targets_blob(con)
+        if ver < 4:
+            _migrate_sparse_groups(con)
+        con.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+def _migrate_filters_blobs(con):
+    """v1: groups.data["filters_cfg"]["filters"] -> filters/filter_responses rows."""
+    gids = [r[0] for r in con.execute(
+        "SELECT gid FROM groups WHERE data LIKE '%\"filters_cfg\"%'"
+    ).fetchall()]
+    for gid in gids:
+        row = con.execute("SELECT data FROM groups WHERE gid = ?", (gid,)).fetchone()
+        try:
+            data = json.loads(row[0])
+        except Exception:
+            continue
+        cfg = data.get("filters_cfg")
+        if not isinstance(cfg, dict) or not isinstance(cfg.get("filters"), dict):
+            continue
+        _write_filters(con, int(gid), cfg["filters"], ())
+        con.execute("UPDATE groups SET data = ? WHERE gid = ?", (_dump_group(data), gid))
+
+def _add_response_columns(con):
+    cols = {r[1] for r in con.execute("PRAGMA table_info(filter_responses)")}
+    if "hash" not in cols:
+        con.execute("ALTER TABLE filter_responses ADD COLUMN hash BLOB")
+    if "refs" not in cols:
+        con.execute("ALTER TABLE filter_responses ADD COLUMN refs INTEGER NOT NULL DEFAULT 0")
+    con.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_responses_hash ON filter_responses(hash)")
+
+def _migrate_response_hashes(con):
+    """v2: hash every response, merge identical payloads into one row, recount refs."""
+    keep: dict[bytes, int] = {}
+    rows = con.execute(
+        "SELECT id, data, hash FROM filter_responses ORDER BY hash IS NULL, id"
+    ).fetchall()
+    for rid, data, h in rows:
+        if h is None:
+            try:
+                data = _dump_response(json.loads(data))
+            except Exception:
+                pass
+            h = _response_hash(data)
+        first = keep.get(h)
+        if first is None:
+            keep[h] = rid
+            con.execute("UPDATE filter_responses SET data = ?, hash = ? WHERE id = ?", (data, h, rid))
+        else:
+            con.execute("UPDATE filters SET response_id = ? WHERE response_id = ?", (first, rid))
+            con.execute("DELETE FROM filter_responses WHERE id = ?", (rid,))
+    con.execute("UPDATE filter_responses SET refs = "
+                "(SELECT COUNT(*) FROM filters WHERE response_id = filter_responses.id)")
+    con.execute("DELETE FROM filter_responses WHERE refs = 0")
+
+def _migrate_pm_targets_blob(con):
+    """v3: groups[0].data["_pm_targets"] {"uid": gid} -> pm_targets rows (blob ছিল live, তাই সেটাই জেতে)."""
+    row = con.execute("SELECT data FROM groups WHERE gid = 0").fetchone()
+    if not row:
+        return
+    try:
+        data = json.loads(row[0])
+    except Exception:
+        return
+    blob = data.pop("_pm_targets", None)
+    if isinstance(blob, dict):
+        rows = []
+        for uid, gid in blob.items():
+            try:
+                rows.append((int(uid), int(gid)))
+            except (TypeError, ValueError):
+                continue
+        con.executemany(
+            "INSERT INTO pm_targets(user_id, group_id) VALUES(?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET group_id=excluded.group_id", rows
+        )
+    if data:
+        con.execute("UPDATE groups SET data = ? WHERE gid = 0", (_dump_group(data),))
+    else:
+        con.execute("DELETE FROM groups WHERE gid = 0")
+
+def _migrate_sparse_groups(con):
+    """v4: groups.data-তে default-এর সমান key বাদ (settings.DEFAULTS)."""
+    rows = []
+    for gid, data in con.execute("SELECT gid, data FROM groups"):
+        try:
+            new = _dump_group(json.loads(data))
+        except Exception:
+            continue
+        if new != data:
+            rows.append((new, gid))
+    con.executemany("UPDATE groups SET data = ? WHERE gid = ?", rows)
 
 # ---------- groups table ops ----------
+# filters_cfg["filters"] lives in the filters table, not in the blob;
+# load_* merges it back so callers still see GROUP_SETTINGS[gid]["filters_cfg"]["filters"]
+def _dump_group(data: dict) -> str:
+    data = sparse(data or {})               # শুধু default থেকে আলাদা key (settings.py)
+    cfg = data.get("filters_cfg")
+    if isinstance(cfg, dict) and "filters" in cfg:
+        data = dict(data)
+        data["filters_cfg"] = {k: v for k, v in cfg.items() if k != "filters"}
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+def _attach_filters(data: dict, filters: dict) -> dict:
+    if filters or isinstance(data.get("filters_cfg"), dict):
+        cfg = dict(data.get("filters_cfg") or {})
+        cfg["filters"] = filters
+        data["filters_cfg"] = cfg
+    return data
+
+@timed("db_seconds", op="load_group")
 def load_group(gid: int) -> dict | None:
-    with conn_ctx() as con:
+    with conn_ctx(readonly=True) as con:
         cur = con.cursor()
         cur.execute("SELECT data FROM groups WHERE gid = ?", (gid,))
         row = cur.fetchone()
+        filters = _read_filters(con, gid).get(gid, {})
         if not row:
-            return None
+            return _attach_filters({}, filters) if filters else None
         try:
-            return json.loads(row["data"])
+            return _attach_filters(json.loads(row["data"]), filters)
         except Exception:
             return None
 
+@timed("db_seconds", op="save_group")
 def save_group(gid: int, data: dict):
-    payload = json.dumps(data or {}, ensure_ascii=False, separators=(",", ":"))
+    payload = _dump_group(data)
     with conn_ctx() as con:
         cur = con.cursor()
         cur.execute(
@@ -73,11 +303,28 @@ def save_group(gid: int, data: dict):
             "ON CONFLICT(gid) DO UPDATE SET data=excluded.data",
             (gid, payload)
         )
+        _log_changes(con, "g", (gid,))
         con.commit()
 
+@timed("db_seconds", op="save_groups")
+def save_groups(items) -> None:
+    """Batch upsert [(gid, data), ...] in one transaction (write-behind flush)."""
+    rows = [(int(gid), _dump_group(data)) for gid, data in items]
+    if not rows:
+        return
+    with conn_ctx() as con:
+        con.executemany(
+            "INSERT INTO groups(gid, data) VALUES(?, ?) "
+            "ON CONFLICT(gid) DO UPDATE SET data=excluded.data",
+            rows
+        )
+        _log_changes(con, "g", [gid for gid, _ in rows])
+        con.commit()
+
+@timed("db_seconds", op="load_all_groups")
 def load_all_groups() -> dict[int, dict]:
     out: dict[int, dict] = {}
-    with conn_ctx() as con:
+    with conn_ctx(readonly=True) as con:
         cur = con.cursor()
         cur.execute("SELECT gid, data FROM groups")
         for gid, data in cur.fetchall():
@@ -85,28 +332,259 @@ def load_all_groups() -> dict[int, dict]:
                 out[int(gid)] = json.loads(data)
             except Exception:
                 out[int(gid)] = {}
+        for gid, filters in _read_filters(con).items():
+            out[gid] = _attach_filters(out.get(gid, {}), filters)
     return out
 
+@timed("db_seconds", op="load_groups")
+def load_groups(gids) -> dict[int, dict]:
+    """Batch load_group for warm-up: { gid: data } (missing gids -> {})."""
+    gids = [int(g) for g in gids]
+    if not gids:
+        return {}
+    out: dict[int, dict] = {g: {} for g in gids}
+    with conn_ctx(readonly=True) as con:
+        rows = con.execute(
+            f"SELECT gid, data FROM groups WHERE gid IN ({','.join('?' * len(gids))})", gids
+        ).fetchall()
+        for gid, data in rows:
+            try:
+                out[int(gid)] = json.loads(data)
+            except Exception:
+                pass
+        for gid, filters in _read_filters(con, gids).items():
+            out[gid] = _attach_filters(out[gid], filters)
+    return out
+
+def group_ids(limit: int = 0) -> list[int]:
+    """gids worth warming: groups with the most filters first, then the rest."""
+    with conn_ctx(readonly=True) as con:
+        rows = con.execute(
+            "SELECT gid FROM (SELECT gid, COUNT(*) AS n FROM filters GROUP BY gid "
+            "UNION ALL SELECT gid, 0 FROM groups WHERE gid NOT IN (SELECT gid FROM filters)) "
+            "ORDER BY n DESC" + (" LIMIT ?" if limit > 0 else ""),
+            (limit,) if limit > 0 else ()
+        ).fetchall()
+    return [int(r[0]) for r in rows]
+
+# ---------- filters / filter_responses table ops ----------
+def _read_filters(con, gid=None) -> dict[int, dict]:
+    """{ gid: { trigger: response } } in insertion order; shared responses parsed once.
+    gid: one gid, a list of gids, or None (all)."""
+    sql = ("SELECT f.gid, f.trigger, f.response_id, r.data FROM filters f "
+           "JOIN filter_responses r ON r.id = f.response_id")
+    args = ()
+    if isinstance(gid, (list, tuple)):
+        sql += f" WHERE f.gid IN ({','.join('?' * len(gid))})"; args = tuple(gid)
+    elif gid is not None:
+        sql += " WHERE f.gid = ?"; args = (gid,)
+    sql += " ORDER BY f.gid, f.rowid"
+    out: dict[int, dict] = {}
+    parsed: dict[int, dict] = {}
+    for g, trg, rid, data in con.execute(sql, args):
+        resp = parsed.get(rid)
+        if resp is None:
+            try:
+                resp = json.loads(data)
+            except Exception:
+                resp = {}
+            parsed[rid] = resp
+        out.setdefault(int(g), {})[trg] = resp
+    return out
+
+def _dump_response(resp) -> str:
+    """Canonical JSON (sorted keys) — একই content = একই hash"""
+    return json.dumps(resp or {}, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+
+def _response_hash(payload: str) -> bytes:
+    return hashlib.blake2b(payload.encode(), digest_size=16).digest()
+
+def _response_id(con, payload: str) -> int:
+    """Existing row with the same content, else a new one (refs=0; caller counts)."""
+    h = _response_hash(payload)
+    row = con.execute("SELECT id FROM filter_responses WHERE hash = ?", (h,)).fetchone()
+    if row:
+        return row[0]
+    return con.execute(
+        "INSERT INTO filter_responses(data, hash, refs) VALUES(?, ?, 0)", (payload, h)
+    ).lastrowid
+
+def _write_filters(con, gid: int, upserts: dict, deletes):
+    """
+    Row-level upsert/delete. Responses are shared by content across triggers and groups;
+    refs is adjusted per change and a row is dropped when it reaches 0.
+    """
+    dels = [t for t in deletes if t not in upserts]
+    old: dict[str, int] = {}
+    for trg in (*upserts, *dels):
+        row = con.execute(
+            "SELECT response_id FROM filters WHERE gid = ? AND trigger = ?", (gid, trg)
+        ).fetchone()
+        if row:
+            old[trg] = row[0]
+    delta: dict[int, int] = {}
+    con.executemany("DELETE FROM filters WHERE gid = ? AND trigger = ?", [(gid, t) for t in dels])
+    for t in dels:
+        if t in old:
+            delta[old[t]] = delta.get(old[t], 0) - 1
+    ids: dict[str, int] = {}
+    for trg, resp in upserts.items():
+        payload = _dump_response(resp)
+        rid = ids.get(payload)
+        if rid is None:
+            rid = ids[payload] = _response_id(con, payload)
+        prev = old.get(trg)
+        if prev == rid:
+            continue
+        if prev is not None:
+            delta[prev] = delta.get(prev, 0) - 1
+        delta[rid] = delta.get(rid, 0) + 1
+        con.execute(
+            "INSERT INTO filters(gid, trigger, response_id) VALUES(?, ?, ?) "
+            "ON CONFLICT(gid, trigger) DO UPDATE SET response_id=excluded.response_id",
+            (gid, trg, rid)
+        )
+    changed = [(d, rid) for rid, d in delta.items() if d]
+    con.executemany("UPDATE filter_responses SET refs = refs + ? WHERE id = ?", changed)
+    con.executemany("DELETE FROM filter_responses WHERE id = ? AND refs <= 0",
+                    [(rid,) for d, rid in changed if d < 0])
+
+@timed("db_seconds", op="save_filters")
+def save_filters(gid: int, upserts: dict, deletes=()):
+    """
+    Persist only the changed triggers of one group in a single transaction.
+    upserts: { trigger: response }, deletes: iterable of triggers
+    """
+    with conn_ctx() as con:
+        with write_txn(con):
+            _write_filters(con, int(gid), upserts or {}, list(deletes or ()))
+            _log_changes(con, "g", (int(gid),))
+
+def iter_filters(gid: int):
+    """Yield (trigger, response) of one group in insertion order without building a dict."""
+    parsed: dict[int, dict] = {}
+    with conn_ctx(readonly=True) as con:
+        cur = con.execute(
+            "SELECT f.trigger, f.response_id, r.data FROM filters f "
+            "JOIN filter_responses r ON r.id = f.response_id WHERE f.gid = ? ORDER BY f.rowid",
+            (int(gid),)
+        )
+        for trg, rid, data in cur:
+            resp = parsed.get(rid)
+            if resp is None:
+                try:
+                    resp = json.loads(data)
+                except Exception:
+                    resp = {}
+                parsed[rid] = resp
+            yield trg, resp
+
+@timed("db_seconds", op="import_filters")
+def import_filters(gid: int, rows, replace: bool = False, batch: int = 1000, progress=None) -> int:
+    """
+    Stream (trigger, response) rows into one group in a single transaction.
+    replace=True drops the group's existing filters first. progress(n) after each batch.
+    The write lock is held until rows is exhausted: feed it from a local source, not the network.
+    Returns the number of rows written.
+    """
+    gid = int(gid)
+    n = 0
+    with conn_ctx() as con:
+        with write_txn(con):
+            if replace:
+                old = [r[0] for r in con.execute("SELECT trigger FROM filters WHERE gid = ?", (gid,))]
+                _write_filters(con, gid, {}, old)
+            chunk: dict = {}
+            for trg, resp in rows:
+                chunk[trg] = resp
+                if len(chunk) >= batch:
+                    _write_filters(con, gid, chunk, ())
+                    n += len(chunk); chunk = {}
+                    if progress:
+                        progress(n)
+            if chunk:
+                _write_filters(con, gid, chunk, ())
+                n += len(chunk)
+            _log_changes(con, "g", (gid,))
+    return n
+
+def read_group_filters(gid: int) -> dict:
+    """{ trigger: response } of one group (fresh from DB)."""
+    with conn_ctx(readonly=True) as con:
+        return _read_filters(con, int(gid)).get(int(gid), {})
+
 # ---------- user_groups table ops ----------
 def set_user_group(user_id: int, gid: int, title: str = ""):
+    link_user_groups([(user_id, gid, title)])
+
+def remove_user_group(user_id: int, gid: int):
+    unlink_user_groups([(user_id, gid)])
+
+@timed("db_seconds", op="link_user_groups")
+def link_user_groups(rows) -> None:
+    """Batch upsert [(user_id, gid, title), ...] in one transaction."""
+    rows = [(int(uid), int(gid), title or "") for uid, gid, title in rows]
+    if not rows:
+        return
     with conn_ctx() as con:
-        con.execute(
+        con.executemany(
             "INSERT INTO user_groups(user_id, gid, title) VALUES(?, ?, ?) "
             "ON CONFLICT(user_id, gid) DO UPDATE SET title=excluded.title",
-            (user_id, gid, title or "")
+            rows
         )
+        _log_changes(con, "u", {uid for uid, _, _ in rows})
+        _log_changes(con, "m", {gid for _, gid, _ in rows})
         con.commit()
 
-def remove_user_group(user_id: int, gid: int):
+@timed("db_seconds", op="unlink_user_groups")
+def unlink_user_groups(pairs) -> None:
+    """Batch delete [(user_id, gid), ...] in one transaction."""
+    pairs = [(int(uid), int(gid)) for uid, gid in pairs]
+    if not pairs:
+        return
+    with conn_ctx() as con:
+        con.executemany("DELETE FROM user_groups WHERE user_id = ? AND gid = ?", pairs)
+        _log_changes(con, "u", {uid for uid, _ in pairs})
+        _log_changes(con, "m", {gid for _, gid in pairs})
+        con.commit()
+
+@timed("db_seconds", op="unlink_group")
+def unlink_group(gid: int) -> list[int]:
+    """Drop every user's link to gid (bot removed). Returns the user_ids that were linked."""
     with conn_ctx() as con:
-        con.execute("DELETE FROM user_groups WHERE user_id = ? AND gid = ?", (user_id, gid))
+        uids = [int(r[0]) for r in con.execute("SELECT user_id FROM user_groups WHERE gid = ?", (gid,))]
+        if uids:
+            con.execute("DELETE FROM user_groups WHERE gid = ?", (gid,))
+            _log_changes(con, "u", uids)
+            _log_changes(con, "m", (gid,))
         con.commit()
+    return uids
 
+@timed("db_seconds", op="get_group_users")
+def get_group_users(gid: int) -> list[int]:
+    """user_ids linked to gid (idx_user_groups_gid)."""
+    with conn_ctx(readonly=True) as con:
+        return [int(r[0]) for r in con.execute("SELECT user_id FROM user_groups WHERE gid = ?", (gid,))]
+
+@timed("db_seconds", op="set_group_title")
+def set_group_title(gid: int, title: str) -> int:
+    """Group title changed -> update every linked user's row. Returns rows changed."""
+    with conn_ctx() as con:
+        cur = con.execute(
+            "UPDATE user_groups SET title = ? WHERE gid = ? AND title IS NOT ?",
+            (title or "", gid, title or "")
+        )
+        if cur.rowcount:
+            _log_changes(con, "t", (gid,))
+        con.commit()
+        return cur.rowcount
+
+@timed("db_seconds", op="get_user_groups")
 def get_user_groups(user_id: int) -> dict[int, dict]:
     """
     Returns { gid: { 'title': str } }
     """
-    with conn_ctx() as con:
+    with conn_ctx(readonly=True) as con:
         cur = con.cursor()
         cur.execute("SELECT gid, title FROM user_groups WHERE user_id = ?", (user_id,))
         res = {}
@@ -114,12 +592,13 @@ def get_user_groups(user_id: int) -> dict[int, dict]:
             res[int(gid)] = {"title": title or ""}
         return res
 
+@timed("db_seconds", op="get_all_user_groups")
 def get_all_user_groups() -> dict[int, dict[int, dict]]:
     """
     Returns { user_id: { gid: { 'title': str } } }
     """
     out: dict[int, dict[int, dict]] = {}
-    with conn_ctx() as con:
+    with conn_ctx(readonly=True) as con:
         cur = con.cursor()
         cur.execute("SELECT user_id, gid, title FROM user_groups")
         for uid, gid, title in cur.fetchall():
@@ -128,6 +607,7 @@ def get_all_user_groups() -> dict[int, dict[int, dict]]:
     return out
 
 # ---------- pm_targets table ops (persist /filters_group selection) ----------
+@timed("db_seconds", op="set_pm_target")
 def set_pm_target(user_id: int, group_id: int):
     """Persist the user's selected target group for PM filter commands."""
     with conn_ctx() as con:
@@ -136,18 +616,53 @@ def set_pm_target(user_id: int, group_id: int):
             "ON CONFLICT(user_id) DO UPDATE SET group_id=excluded.group_id",
             (user_id, group_id)
         )
+        _log_changes(con, "p", (user_id,))
         con.commit()
 
+@timed("db_seconds", op="get_pm_target")
 def get_pm_target(user_id: int) -> int | None:
     """Return last selected group_id for this user, or None."""
-    with conn_ctx() as con:
+    with conn_ctx(readonly=True) as con:
         cur = con.cursor()
         cur.execute("SELECT group_id FROM pm_targets WHERE user_id = ?", (user_id,))
         row = cur.fetchone()
         return int(row["group_id"]) if row else None
 
+@timed("db_seconds", op="clear_pm_target")
 def clear_pm_target(user_id: int):
     """Clear stored PM target for a user (optional helper)."""
     with conn_ctx() as con:
         con.execute("DELETE FROM pm_targets WHERE user_id = ?", (user_id,))
-        con.commit()
\ No newline at end of file
+        _log_changes(con, "p", (user_id,))
+        con.commit()
+
+# ---------- change_log ops (multi-process cache invalidation) ----------
+def _log_changes(con, kind: str, keys) -> None:
+    if CHANGE_LOG:
+        pid = os.getpid()
+        con.executemany("INSERT INTO change_log(kind, key, pid) VALUES(?, ?, ?)",
+                        [(kind, int(k), pid) for k in keys])
+
+def data_version() -> int:
+    """Changes when another connection commits (this thread's connection)."""
+    with conn_ctx(readonly=True) as con:
+        return con.execute("PRAGMA data_version").fetchone()[0]
+
+def change_log_head() -> int:
+    with conn_ctx(readonly=True) as con:
+        return con.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+
+def read_changes(after: int) -> tuple[int, list]:
+    """Returns (last seq, [(kind, key, pid), ...]) of rows after `after`."""
+    with conn_ctx(readonly=True) as con:
+        rows = con.execute(
+            "SELECT seq, kind, key, pid FROM change_log WHERE seq > ? ORDER BY seq", (after,)
+        ).fetchall()
+    if not rows:
+        return after, []
+    return rows[-1][0], [(k, int(key), pid) for _, k, key, pid in rows]
+
+def prune_changes(keep: int = CHANGE_LOG_KEEP) -> None:
+    with conn_ctx() as con:
+        con.execute("DELETE FROM change_log WHERE seq <= (SELECT MAX(seq) FROM change_log) - ?", (keep,))
+        con.commit()
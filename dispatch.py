@@ -0,0 +1,151 @@
+# dispatch.py
+# Per-chat ordered sharded worker pool: chat.id -> fixed shard (one thread each).
+# একই চ্যাটের মেসেজ ক্রমানুসারে, আলাদা চ্যাট parallel-এ চলে।
+from __future__ import annotations
+import heapq
+import itertools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import metrics
+
+logger = logging.getLogger("TeleBot")
+
+_STOP = object()
+
+
+def chat_key(obj) -> int:
+    """Update object -> chat id (Message, CallbackQuery, ChatMemberUpdated, ...)."""
+    chat = getattr(obj, "chat", None)
+    if chat is None:
+        msg = getattr(obj, "message", None)          # CallbackQuery
+        chat = getattr(msg, "chat", None)
+    if chat is not None:
+        return int(chat.id)
+    user = getattr(obj, "from_user", None)
+    return int(user.id) if user is not None else 0
+
+
+class ShardedWorkerPool:
+    """
+    Drop-in for telebot.util.ThreadPool (put / raise_exceptions / clear_exceptions / close).
+    put(task, update, ...) routes by chat_key(update) % shards.
+    """
+    def __init__(self, telebot=None, shards: int = 8):
+        self.telebot = telebot
+        self.num_threads = max(int(shards), 1)
+        self.queues = [queue.Queue() for _ in range(self.num_threads)]
+        self.exception_event = threading.Event()
+        self.exception_info = None
+        self.workers = []
+        for i, q in enumerate(self.queues):
+            t = threading.Thread(target=self._run, args=(q,), name=f"shard-{i}", daemon=True)
+            t.start()
+            self.workers.append(t)
+        metrics.register_collector(lambda: [
+            ("shard_queue_depth", "gauge", {"shard": str(i)}, d) for i, d in enumerate(self.depths())
+        ])
+
+    def shard_of(self, key: int) -> int:
+        return hash(key) % self.num_threads
+
+    # --- telebot ThreadPool API ---
+    def put(self, func, *args, **kwargs):
+        key = chat_key(args[0]) if args else 0
+        self.queues[self.shard_of(key)].put((func, args, kwargs, None))
+
+    def raise_exceptions(self):
+        if self.exception_event.is_set():
+            raise self.exception_info
+
+    def clear_exceptions(self):
+        self.exception_event.clear()
+
+    def close(self):
+        for q in self.queues:
+            q.put(_STOP)
+        for t in self.workers:
+            if t is not threading.current_thread():
+                t.join()
+
+    # --- generic API (webhook bridge) ---
+    def submit(self, key: int, func, *args, **kwargs) -> Future:
+        fut: Future = Future()
+        self.queues[self.shard_of(key)].put((func, args, kwargs, fut))
+        return fut
+
+    def depths(self) -> list[int]:
+        """Per-shard queue depth."""
+        return [q.qsize() for q in self.queues]
+
+    def _run(self, q: queue.Queue):
+        while True:
+            item = q.get()
+            if item is _STOP:
+                return
+            func, args, kwargs, fut = item
+            if fut is not None and not fut.set_running_or_notify_cancel():
+                continue
+            try:
+                res = func(*args, **kwargs)
+            except Exception as e:
+                if fut is not None:
+                    fut.set_exception(e)
+                else:
+                    self._on_exception(e)
+            else:
+                if fut is not None:
+                    fut.set_result(res)
+
+    def _on_exception(self, e: Exception):
+        handler = getattr(self.telebot, "exception_handler", None)
+        handled = handler.handle(e) if handler is not None else False
+        if not handled:
+            logger.error("handler error: %r", e)
+            self.exception_info = e
+            self.exception_event.set()
+
+
+def install(bot, shards: int) -> ShardedWorkerPool:
+    """Replace a threaded TeleBot's worker pool with a ShardedWorkerPool."""
+    old = getattr(bot, "worker_pool", None)
+    pool = ShardedWorkerPool(bot, shards)
+    bot.worker_pool = pool
+    if old is not None:
+        old.close()
+    return pool
+
+
+class Scheduler:
+    """One thread + heap for delayed calls (Timer thread per call নয়)."""
+    def __init__(self, name: str = "scheduler"):
+        self._seq = itertools.count()
+        self._heap: list = []
+        self._cv = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def call_later(self, delay: float, func, *args) -> None:
+        with self._cv:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), func, args))
+            self._cv.notify()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def _run(self):
+        while True:
+            with self._cv:
+                while True:
+                    now = time.monotonic()
+                    if self._heap and self._heap[0][0] <= now:
+                        _, _, func, args = heapq.heappop(self._heap)
+                        break
+                    self._cv.wait((self._heap[0][0] - now) if self._heap else None)
+            try:
+                func(*args)
+            except Exception as e:
+                logger.error("scheduled call failed: %r", e)
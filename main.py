@@ -2,19 +2,52 @@
 # Run: pip install pyTelegramBotAPI
 # BOT_TOKEN env var set করুন, না হলে নিচের ডামি টোকেন বদলে দিন
 
+import startup   # সবার আগে: startup timing-এর শূন্য বিন্দু
 import os
+import threading
 import telebot
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
 
+import supervisor
+BOT_TOKEN = os.environ.get("BOT_TOKEN", "8218499502:AAEsLD_W_QO4WIz1yuAg-QF9fuIcmBDI-DY")
+# BOT_MODE=polling (default) | webhook (aiohttp + AsyncTeleBot, দেখুন webhook.py)
+BOT_MODE = os.environ.get("BOT_MODE", "polling")
+# BOT_API_URL: কাস্টম Bot API endpoint (যেমন local fake server: http://127.0.0.1:8081/bot{0}/{1})
+BOT_API_URL = os.environ.get("BOT_API_URL")
+ALLOWED_UPDATES = ['message','callback_query','chat_member','my_chat_member','chat_join_request']
+if BOT_API_URL:
+    telebot.apihelper.API_URL = BOT_API_URL
+# BOT_PROCESSES=N (>1): এই process শুধু update এনে chat.id অনুযায়ী N worker-এ পাঠায় (দেখুন supervisor.py)
+if supervisor.PROCESSES > 1 and not supervisor.IS_WORKER:
+    supervisor.run(BOT_TOKEN, BOT_MODE, supervisor.PROCESSES, ALLOWED_UPDATES, os.path.abspath(__file__))
+    raise SystemExit(0)
+
 from state import USER_GROUPS, GROUP_SETTINGS   # তোমার বিদ্যমান state.py
+from tgcache import bot_username, get_chat
 try:
     # utils.py তে থাকলে ব্যবহার করবো
     from utils import register_group_for_user
 except Exception:
     register_group_for_user = None
 
-BOT_TOKEN = os.environ.get("BOT_TOKEN", "8218499502:AAEsLD_W_QO4WIz1yuAg-QF9fuIcmBDI-DY")
-bot = telebot.TeleBot(BOT_TOKEN, parse_mode="HTML")
+# BOT_WORKER_SHARDS: chat.id -> fixed worker shard (চ্যাটের ভেতরে ক্রম ঠিক থাকে); 0 = telebot default pool
+WORKER_SHARDS = int(os.environ.get("BOT_WORKER_SHARDS", "8"))
+
+if BOT_MODE == "webhook" and not supervisor.IS_WORKER:
+    from webhook import AsyncBridge
+    bot = AsyncBridge(BOT_TOKEN, parse_mode="HTML", shards=WORKER_SHARDS)
+else:
+    bot = telebot.TeleBot(BOT_TOKEN, parse_mode="HTML")
+    if WORKER_SHARDS > 0:
+        from dispatch import install as install_sharded_pool
+        install_sharded_pool(bot, WORKER_SHARDS)
+# BOT_OUTBOX=0 -> পুরনো inline send; নাহলে handler শুধু enqueue করে (rate limit + 429 retry, দেখুন outbox.py)
+if os.environ.get("BOT_OUTBOX", "1") != "0":
+    from outbox import Outbox, QueuedBot
+    bot = QueuedBot(bot, Outbox(bot))
+# command / callback prefix -> handler index (দেখুন router.py)
+from router import get_router
+router = get_router(bot)
 
 # ---------- Helpers ----------
 def _link_user_group(user_id: int, gid: int, title: str):
@@ -44,9 +77,9 @@ def _link_user_group(user_id: int, gid: int, title: str):
 # ---------- START ----------
 START_TEXT = "✫ 𝝜𝝚ⳐⳐ𝝤 ‌{mention} Ѡ𝝚Ⳑ𝗖𝝤𝝡𝝚 𝝩𝝤 𝝡Ƴ 𝝜𝝤𝝡𝝚 ✫"
 
-@bot.message_handler(commands=['start'])
+@router.command('start')
 def start_cmd(m):
-    u = bot.get_me().username
+    u = bot_username(bot)
 
     # deep-link ?start=gid_... থাকলে, তবু প্রথমে স্টার্ট টেক্সটই দেখাবো
     mention = f"<a href='tg://user?id={m.from_user.id}'>{m.from_user.first_name}</a>"
@@ -80,7 +113,7 @@ def start_cmd(m):
     bot.reply_to(m, start_text, parse_mode="HTML", reply_markup=kb)
 
 # ---------- CONNECT / SETTINGS ----------
-@bot.message_handler(commands=['settings'])
+@router.command('settings')
 def settings_cmd(m):
     """
     গ্রুপে /settings দিলে ইউজারের সাথে এই গ্রুপটা লিঙ্ক করে দিবো — admin লাগবে না।
@@ -88,7 +121,7 @@ def settings_cmd(m):
     """
     if m.chat.type in ("group", "supergroup"):
         _link_user_group(m.from_user.id, m.chat.id, m.chat.title or str(m.chat.id))
-        u = bot.get_me().username
+        u = bot_username(bot)
         kb = InlineKeyboardMarkup()
         kb.add(InlineKeyboardButton("🔗 Open in PM", url=f"https://t.me/{u}?start=gid_{m.chat.id}"))
         bot.reply_to(m, "✅ Linked! নিচের বাটনে চাপ দিয়ে PM-এ ওপেন করুন।", reply_markup=kb)
@@ -104,7 +137,7 @@ def settings_cmd(m):
         kb.add(InlineKeyboardButton(info["title"], callback_data=f"pm_open:{gid}"))
     bot.reply_to(m, "👉 একটি গ্রুপ বেছে নিন:", reply_markup=kb)
 
-@bot.callback_query_handler(func=lambda c: c.data.startswith("pm_open:"))
+@router.callback("pm_open:")
 def pm_open_cb(c):
     gid = int(c.data.split(":")[1])
     info = USER_GROUPS[c.from_user.id].get(gid)
@@ -118,7 +151,7 @@ def pm_open_cb(c):
         c.message.chat.id, c.message.message_id, parse_mode="HTML"
     )
 
-@bot.message_handler(commands=['connect'])
+@router.command('connect')
 def connect_cmd(m):
     """
     PM থেকে ম্যানুয়ালি `/connect -100xxxxxxxxxx` দিলে লিঙ্ক হবে।
@@ -139,7 +172,7 @@ def connect_cmd(m):
     # টাইটেল জানা না থাকলেও লিঙ্ক করবো
     title = str(gid)
     try:
-        ch = bot.get_chat(gid)
+        ch = get_chat(bot, gid)
         title = getattr(ch, "title", None) or title
     except Exception:
         pass
@@ -150,8 +183,39 @@ def connect_cmd(m):
 from modules.filters import register as register_filters
 register_filters(bot)
 
+# ---------- chat_member / my_chat_member -> metadata cache ----------
+from tgcache import register as register_tgcache
+register_tgcache(bot)
+
+# ---------- Metrics (BOT_METRICS=1; দেখুন metrics.py) ----------
+import metrics
+metrics.instrument_bot(bot)
+metrics.start()
+
+# ---------- Startup: handlers ready; warm-up deferred (BOT_PRELOAD, দেখুন startup.py) ----------
+startup.mark("modules")
+startup.watch_first_update(bot)
+if BOT_MODE != "webhook" or supervisor.IS_WORKER:
+    threading.Thread(target=startup.warm_me, args=(bot,), name="get-me", daemon=True).start()
+if supervisor.IS_WORKER:
+    _idx, _n = int(supervisor.WORKER_INDEX), supervisor.PROCESSES
+    startup.preload(keep=lambda gid: gid % _n == _idx)
+else:
+    startup.preload()
+startup.mark("polling")
+
+if supervisor.IS_WORKER:
+    print(f"Worker {supervisor.WORKER_INDEX} is running…")
+    supervisor.serve_worker(bot)
+    raise SystemExit(0)
+
 print("Bot is running…")
-bot.infinity_polling(
-    allowed_updates=['message','callback_query','chat_member','my_chat_member','chat_join_request'],
-    timeout=20, long_polling_timeout=20
-)
\ No newline at end of file
+if BOT_MODE == "webhook":
+    from webhook import run_webhook
+    # AsyncBridge-এর blocking call-এর জন্য loop লাগে, তাই get_me warm-up loop চালুর পরে
+    run_webhook(bot, allowed_updates=ALLOWED_UPDATES, on_ready=lambda: startup.warm_me(bot))
+else:
+    bot.infinity_polling(
+        allowed_updates=ALLOWED_UPDATES,
+        timeout=20, long_polling_timeout=20
+    )
\ No newline at end of file
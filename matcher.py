@@ -0,0 +1,71 @@
+# matcher.py
+# Aho-Corasick multi-pattern matcher: একবার টেক্সট স্ক্যান করে সব ট্রিগার খোঁজে
+from __future__ import annotations
+from collections import deque
+from typing import Iterable, List, Optional
+
+
+class TriggerMatcher:
+    """
+    Compiled automaton over a list of triggers.
+    - rank = trigger-এর index (dict insertion order)
+    - first() returns the lowest-rank trigger found anywhere in text,
+      i.e. same result as `for trg in items: if trg in txt: break`
+    """
+    __slots__ = ("triggers", "_goto", "_fail", "_best")
+
+    def __init__(self, triggers: Iterable[str]):
+        self.triggers: List[str] = list(triggers)
+        goto: List[dict] = [{}]
+        best: List[int] = [-1]          # node -> min rank ending here (incl. suffix outputs)
+        for rank, trg in enumerate(self.triggers):
+            if not trg:
+                continue
+            node = 0
+            for ch in trg:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][ch] = nxt
+                    goto.append({}); best.append(-1)
+                node = nxt
+            if best[node] == -1 or rank < best[node]:
+                best[node] = rank
+
+        # BFS: failure links + inherit the best output of the suffix node
+        fail = [0] * len(goto)
+        q = deque(goto[0].values())
+        while q:
+            node = q.popleft()
+            f = fail[node]
+            fb = best[f]
+            if fb != -1 and (best[node] == -1 or fb < best[node]):
+                best[node] = fb
+            for ch, nxt in goto[node].items():
+                q.append(nxt)
+                k = f
+                while k and ch not in goto[k]:
+                    k = fail[k]
+                fail[nxt] = goto[k].get(ch, 0)
+
+        self._goto = goto
+        self._fail = fail
+        self._best = best
+
+    def first(self, text: str) -> Optional[str]:
+        """Lowest-rank trigger contained in text (or None)."""
+        goto, fail, best = self._goto, self._fail, self._best
+        node, hit = 0, -1
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            b = best[node]
+            if b != -1 and (hit == -1 or b < hit):
+                hit = b
+                if hit == 0:
+                    break
+        return self.triggers[hit] if hit != -1 else None
+
+    def __len__(self) -> int:
+        return len(self.triggers)
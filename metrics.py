@@ -0,0 +1,305 @@
+# metrics.py
+# Lightweight metrics: latency histograms + counters, Prometheus text format।
+# BOT_METRICS=1 না হলে decorator গুলো আসল function-ই ফেরত দেয় (overhead ~0)।
+#   BOT_METRICS_PORT=9108   -> http://127.0.0.1:9108/metrics
+#   BOT_METRICS_FILE=path   -> প্রতি BOT_METRICS_INTERVAL সেকেন্ডে ফাইলে dump
+from __future__ import annotations
+import bisect
+import functools
+import inspect
+import os
+import threading
+import time
+
+ENABLED = os.environ.get("BOT_METRICS", "0") == "1"
+METRICS_HOST = os.environ.get("BOT_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("BOT_METRICS_PORT", "0"))
+METRICS_FILE = os.environ.get("BOT_METRICS_FILE")
+METRICS_INTERVAL = float(os.environ.get("BOT_METRICS_INTERVAL", "15"))
+
+BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PREFIX = "bot_"
+
+_lock = threading.Lock()
+_HISTS: dict = {}        # (name, labels) -> Histogram
+_COUNTERS: dict = {}     # (name, labels) -> [value]
+_COLLECTORS: list = []   # fn() -> [(name, type, labels dict, value)]
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count", "lock")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, v: float) -> None:
+        i = bisect.bisect_left(BUCKETS, v)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += v
+            self.count += 1
+
+
+def _key(name: str, labels: dict):
+    return name, tuple(sorted(labels.items()))
+
+
+def histogram(name: str, **labels) -> Histogram:
+    k = _key(name, labels)
+    h = _HISTS.get(k)
+    if h is None:
+        with _lock:
+            h = _HISTS.setdefault(k, Histogram())
+    return h
+
+
+def observe(name: str, value: float, **labels) -> None:
+    if ENABLED:
+        histogram(name, **labels).observe(value)
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    if not ENABLED:
+        return
+    k = _key(name, labels)
+    with _lock:
+        c = _COUNTERS.get(k)
+        if c is None:
+            _COUNTERS[k] = [value]
+        else:
+            c[0] += value
+
+
+def timed(name: str, **labels):
+    """Decorator: latency histogram (+ <name>_errors_total). Disabled -> fn unchanged."""
+    def deco(fn):
+        if not ENABLED:
+            return fn
+        h = histogram(name, **labels)
+        pc = time.perf_counter
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def awrapper(*args, **kwargs):
+                t0 = pc()
+                try:
+                    return await fn(*args, **kwargs)
+                except Exception:
+                    inc(name + "_errors_total", **labels)
+                    raise
+                finally:
+                    h.observe(pc() - t0)
+            return awrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = pc()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                inc(name + "_errors_total", **labels)
+                raise
+            finally:
+                h.observe(pc() - t0)
+        return wrapper
+    return deco
+
+
+def register_collector(fn) -> None:
+    """fn() -> [(name, "gauge"|"counter", labels, value)] — scrape-এর সময় ডাকা হয়।"""
+    _COLLECTORS.append(fn)
+
+
+def cache_rows(cache: str, stats: dict) -> list:
+    """LRUCache.stats() -> collector rows (hits / misses / evictions / size)."""
+    lb = {"cache": cache}
+    return [
+        ("cache_hits_total", "counter", lb, stats.get("hits", 0)),
+        ("cache_misses_total", "counter", lb, stats.get("misses", 0)),
+        ("cache_evictions_total", "counter", lb, stats.get("evictions", 0)),
+        ("cache_size", "gauge", lb, stats.get("size", 0)),
+    ]
+
+
+# ---------- exposition ----------
+def _fmt_labels(labels, extra=None) -> str:
+    items = list(labels) + (list(extra) if extra else [])
+    if not items:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+
+def render() -> str:
+    out, typed = [], set()
+
+    def head(name, typ):
+        if name not in typed:
+            typed.add(name); out.append(f"# TYPE {name} {typ}")
+
+    with _lock:
+        hists = sorted(_HISTS.items())
+        counters = sorted(_COUNTERS.items())
+    for (name, labels), h in hists:
+        n = PREFIX + name
+        head(n, "histogram")
+        with h.lock:
+            counts, total, count = list(h.counts), h.sum, h.count
+        acc = 0
+        for b, c in zip(BUCKETS, counts):
+            acc += c
+            out.append(f"{n}_bucket{_fmt_labels(labels, [('le', repr(b))])} {acc}")
+        out.append(f"{n}_bucket{_fmt_labels(labels, [('le', '+Inf')])} {count}")
+        out.append(f"{n}_sum{_fmt_labels(labels)} {total}")
+        out.append(f"{n}_count{_fmt_labels(labels)} {count}")
+    for (name, labels), c in counters:
+        n = PREFIX + name
+        head(n, "counter")
+        out.append(f"{n}{_fmt_labels(labels)} {c[0]}")
+    for fn in list(_COLLECTORS):
+        try:
+            rows = fn()
+        except Exception:
+            continue
+        for name, typ, labels, value in rows:
+            n = PREFIX + name
+            head(n, typ)
+            out.append(f"{n}{_fmt_labels(sorted(labels.items()))} {value}")
+    return "\n".join(out) + "\n"
+
+
+def start() -> None:
+    """HTTP endpoint and/or periodic file dump (daemon threads)."""
+    if not ENABLED:
+        return
+    if METRICS_PORT:
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class _H(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *a):
+                pass
+
+        srv = ThreadingHTTPServer((METRICS_HOST, METRICS_PORT), _H)
+        threading.Thread(target=srv.serve_forever, name="metrics-http", daemon=True).start()
+    if METRICS_FILE:
+        def dump():
+            while True:
+                time.sleep(METRICS_INTERVAL)
+                tmp = METRICS_FILE + ".tmp"
+                with open(tmp, "w") as f:
+                    f.write(render())
+                os.replace(tmp, METRICS_FILE)
+        threading.Thread(target=dump, name="metrics-dump", daemon=True).start()
+
+
+# ---------- bot instrumentation ----------
+_HANDLER_LISTS = (
+    "message_handlers", "callback_query_handlers", "chat_member_handlers",
+    "my_chat_member_handlers", "chat_join_request_handlers", "edited_message_handlers",
+)
+
+
+def _raw_bots(bot):
+    """QueuedBot / AsyncBridge -> the TeleBot / AsyncTeleBot holding handler lists."""
+    seen = []
+    for _ in range(4):
+        if bot is None or any(bot is b for b in seen):
+            break
+        seen.append(bot)
+        bot = vars(bot).get("_bot") or vars(bot).get("abot")
+    return seen
+
+
+def instrument_bot(bot) -> None:
+    """Wrap every registered handler with a latency histogram + patch Bot API calls."""
+    if not ENABLED:
+        return
+    for b in _raw_bots(bot):
+        for attr in _HANDLER_LISTS:
+            for h in getattr(b, attr, None) or []:
+                if isinstance(h, dict) and not getattr(h["function"], "_timed", False):
+                    fn = h["function"]
+                    h["function"] = _wrap_handler(fn)
+        router = vars(b).get("_router")          # router.py: routed handler-রাও আলাদা মাপা হয়
+        if router is not None:
+            router.wrap_handlers(lambda fn: fn if getattr(fn, "_timed", False) else _wrap_handler(fn))
+    _patch_api()
+
+
+def _wrap_handler(fn):
+    name = getattr(fn, "__name__", "handler")
+    h = histogram("handler_seconds", handler=name)
+    pc = time.perf_counter
+    if inspect.iscoroutinefunction(fn):
+        async def wrapped(update):
+            t0 = pc()
+            try:
+                return await fn(update)
+            except Exception:
+                inc("handler_errors_total", handler=name)
+                raise
+            finally:
+                h.observe(pc() - t0)
+    else:
+        def wrapped(update):
+            t0 = pc()
+            try:
+                return fn(update)
+            except Exception:
+                inc("handler_errors_total", handler=name)
+                raise
+            finally:
+                h.observe(pc() - t0)
+    wrapped.__name__ = name
+    wrapped._timed = True
+    return wrapped
+
+
+_API_PATCHED = False
+
+
+def _patch_api() -> None:
+    global _API_PATCHED
+    if _API_PATCHED:
+        return
+    _API_PATCHED = True
+    from telebot import apihelper
+    orig = apihelper._make_request
+
+    def _make_request(token, method_name, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return orig(token, method_name, *args, **kwargs)
+        except Exception:
+            inc("api_errors_total", method=method_name)
+            raise
+        finally:
+            observe("api_seconds", time.perf_counter() - t0, method=method_name)
+    apihelper._make_request = _make_request
+
+    try:
+        from telebot import asyncio_helper
+    except ImportError:
+        return
+    aorig = asyncio_helper._process_request
+
+    async def _process_request(token, url, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return await aorig(token, url, *args, **kwargs)
+        except Exception:
+            inc("api_errors_total", method=url)
+            raise
+        finally:
+            observe("api_seconds", time.perf_counter() - t0, method=url)
+    asyncio_helper._process_request = _process_request
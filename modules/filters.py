@@ -2,36 +2,312 @@
 # Admin check নেই; সবাই /filter, /delfilter ব্যবহার করতে পারবে
 # ফিল্টারগুলো state.GROUP_SETTINGS[gid]["filters_cfg"]["filters"] এ সেভ হয়
 
+import bisect
+import csv
+import hashlib
+import html
+import io
+import json
+import os
 import re
+import tempfile
+import threading
+import time
+import requests
+from telebot import apihelper
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
 from telebot.apihelper import ApiTelegramException
 
 from state import USER_GROUPS, GROUP_SETTINGS, PENDING_INPUT  # kept import (unused now, safe)
+from state import save_filters, import_filters, iter_filters, read_group_filters, GROUP_CACHE_SIZE
+from state import set_pm_target, ensure_pm_target   # pm_targets table + cache
+import metrics
+from cache import LRUCache, TTLCache
+from dispatch import Scheduler
+from matcher import TriggerMatcher
+from utils import compile_template, buttons_markup_json
+from router import get_router
+from outbox import reply_to as queued_reply, send as queued_send, PRIO_AUTO, QueuedBot
 
-DEFAULT_FILTERS_CFG = {"filters": {}}
 _BTN_RE = re.compile(r"\[([^\]]+)\]\(buttonurl://([^)]+)\)")
 
-# ---- small utils ----
-def _ensure_filters_defaults(gid: int):
+# gid -> _Snapshot (frozen base + TriggerMatcher + delta since build, compiled replies)
+_MATCHERS = LRUCache(GROUP_CACHE_SIZE)
+_FILTER_VARS = frozenset({"MENTION", "GROUPNAME"})
+
+# ---- per-(chat, trigger) cooldown: group-এর "antiflood" চালু থাকলে কার্যকর ----
+# window-এ প্রথম hit-এ reply; বাকি hit গুলো coalesce হলে window শেষে শেষ মেসেজে একটাই reply
+# Default বন্ধ (আগের মতো প্রতি hit-এ reply): group /filtercooldown দিয়ে বা BOT_FILTER_COOLDOWN দিয়ে চালু
+FILTER_COOLDOWN = float(os.environ.get("BOT_FILTER_COOLDOWN", "0"))    # sec; 0 = off
+FILTER_COALESCE = os.environ.get("BOT_FILTER_COALESCE", "1") != "0"
+FILTERS_PAGE_SIZE = int(os.environ.get("BOT_FILTERS_PAGE_SIZE", "40"))   # /filters এক page-এ কয়টা
+# callback_data 64 byte-এ না ধরলে query এখানে থাকে, button-এ শুধু "#<key>"
+_QUERIES = TTLCache(10000, 24 * 3600)
+_COOLDOWN = TTLCache(100000, 3600)    # (gid, trigger) -> [until, suppressed hits, last message]
+_SCHED: Scheduler | None = None
+
+metrics.register_collector(lambda: metrics.cache_rows("filter_matchers", _MATCHERS.stats()))
+
+# ---- incremental filter store ----
+# GROUP_SETTINGS[gid]["filters_cfg"]["filters"] জায়গায় বদলায় (কপি নেই): DB-তে আগে লিখি,
+# তারপর group lock-এর ভেতরে এক ট্রিগার add/replace/remove + নতুন _Snapshot publish (O(changes))।
+# Reader (_filter_guard) পায় immutable _Snapshot; matcher রিবিল্ড হয় background thread-এ
+# (BOT_FILTER_REBUILD_SEC debounce), hot path-এ বা lock ধরে নয়।
+_LOCKS = [threading.Lock() for _ in range(64)]
+FILTER_REBUILD_SEC = float(os.environ.get("BOT_FILTER_REBUILD_SEC", "1"))
+_GONE = object()           # delta-তে মুছে ফেলা trigger
+_REBUILDER: Scheduler | None = None
+_REBUILD_PENDING: set = set()
+
+def _lock(gid: int) -> threading.Lock:
+    return _LOCKS[hash(gid) % len(_LOCKS)]
+
+def _live_filters(gid: int) -> dict:
+    """Mutable filters dict of a group (missing cfg তৈরি হয়, blob write নেই)"""
     g = GROUP_SETTINGS[gid]
     cfg = g.get("filters_cfg")
-    changed = False
     if not isinstance(cfg, dict):
-        cfg = DEFAULT_FILTERS_CFG.copy(); changed = True
-    elif "filters" not in cfg or not isinstance(cfg["filters"], dict):
-        cfg["filters"] = {}; changed = True
-    if changed:
-        g2 = dict(g); g2["filters_cfg"] = cfg
-        GROUP_SETTINGS[gid] = g2
-
-def _mutate_filters(gid: int, fn):
-    _ensure_filters_defaults(gid)
-    g = GROUP_SETTINGS[gid]
-    cfg = dict(g["filters_cfg"])
-    fn(cfg)
-    g2 = dict(g); g2["filters_cfg"] = cfg
-    GROUP_SETTINGS[gid] = g2
-    return cfg
+        cfg = g["filters_cfg"] = {}
+    items = cfg.get("filters")
+    if not isinstance(items, dict):
+        items = cfg["filters"] = {}
+    return items
+
+def add_filters(gid: int, upserts: dict) -> None:
+    """Add or replace triggers (one transaction); existing triggers keep their position."""
+    gid = int(gid)
+    if not upserts:
+        return
+    with _lock(gid):
+        save_filters(gid, upserts, ())
+        items = _live_filters(gid)
+        _index_add(gid, items, [t for t in upserts if t not in items])
+        for trg, resp in upserts.items():
+            items[trg] = resp
+        _publish(gid, items, upserts)
+
+def add_filter(gid: int, trigger: str, resp: dict) -> None:
+    add_filters(gid, {trigger: resp})
+
+def replace_filter(gid: int, trigger: str, resp: dict) -> bool:
+    """Only if the trigger exists."""
+    gid = int(gid)
+    with _lock(gid):
+        if trigger not in _live_filters(gid):
+            return False
+        save_filters(gid, {trigger: resp}, ())
+        items = _live_filters(gid)
+        items[trigger] = resp
+        _publish(gid, items, {trigger: resp})
+    return True
+
+def remove_filters(gid: int, triggers) -> list:
+    """Delete the given triggers; returns the ones that existed."""
+    gid = int(gid)
+    with _lock(gid):
+        items = _live_filters(gid)
+        gone = [t for t in dict.fromkeys(triggers) if t in items]
+        if gone:
+            save_filters(gid, {}, gone)
+            for t in gone:
+                del items[t]
+            _index_remove(gid, items, gone)
+            _publish(gid, items, dict.fromkeys(gone, _GONE))
+    return gone
+
+def remove_filter(gid: int, trigger: str) -> bool:
+    return bool(remove_filters(gid, (trigger,)))
+
+# ---- sorted trigger index (/filters listing + search) ----
+# gid -> _KeyIndex; add/remove-এ bisect দিয়ে জায়গায় বদলায়, তাই একটা page = O(log n + page)।
+# filters dict বদলে গেলে (reload / অন্য process-এর invalidation) প্রথম ব্যবহারে একবার sort।
+_INDEX = LRUCache(GROUP_CACHE_SIZE)
+
+class _KeyIndex:
+    __slots__ = ("items", "keys")
+
+    def __init__(self, items: dict):
+        self.items, self.keys = items, sorted(items)
+
+def _index_add(gid: int, items: dict, new) -> None:
+    """Caller holds _lock(gid)."""
+    idx = _INDEX.get(gid)
+    if idx is None or idx.items is not items:
+        _INDEX.pop(gid, None)
+        return
+    for t in new:
+        bisect.insort(idx.keys, t)
+
+def _index_remove(gid: int, items: dict, gone) -> None:
+    """Caller holds _lock(gid)."""
+    idx = _INDEX.get(gid)
+    if idx is None or idx.items is not items:
+        _INDEX.pop(gid, None)
+        return
+    keys = idx.keys
+    for t in gone:
+        i = bisect.bisect_left(keys, t)
+        if i < len(keys) and keys[i] == t:
+            del keys[i]
+
+def sorted_triggers(gid: int) -> list:
+    """Sorted trigger list of a group (shared, read-only for callers)."""
+    gid = int(gid)
+    idx = _INDEX.get(gid)
+    items = (GROUP_SETTINGS[gid].get("filters_cfg") or {}).get("filters")
+    if not items:
+        return []
+    if idx is None or idx.items is not items:
+        with _lock(gid):
+            idx = _KeyIndex(items)
+            _INDEX.put(gid, idx)
+    return idx.keys
+
+def filters_page(gid: int, offset: int = 0, limit: int = 40, query: str = ""):
+    """(triggers, total, offset) — query থাকলে prefix match (sorted range, bisect); offset শেষ page-এ clamp।"""
+    keys = sorted_triggers(gid)
+    lo, hi = 0, len(keys)
+    if query:
+        lo = bisect.bisect_left(keys, query)
+        hi = bisect.bisect_left(keys, query + "\U0010ffff", lo)
+    total = hi - lo
+    offset = max(0, min(offset, (max(total - 1, 0) // limit) * limit))
+    return keys[lo + offset: min(lo + offset + limit, hi)], total, offset
+
+class _Snapshot:
+    """
+    Immutable view of one group's filters: base (frozen copy at version `built`) + its matcher,
+    plus delta {trigger: (version, response | _GONE, re-added at | None)} of the changes made
+    after the base was built. version = snapshot-local ordering counter (full build-এ 0 থেকে শুরু,
+    বাইরে দেওয়া হয় না)।
+    """
+    __slots__ = ("live", "version", "built", "base", "matcher", "delta", "added", "compiled")
+
+    def __init__(self, live: dict, version: int, built: int, base: dict, matcher: TriggerMatcher,
+                 delta: dict | None = None, compiled: dict | None = None):
+        self.live, self.version, self.built = live, version, built
+        self.base, self.matcher = base, matcher
+        self.delta = delta or {}
+        # build-এর পরে (আবার) যোগ হওয়া trigger: live dict-এর মতো base-এর পরে, insertion order-এ
+        self.added = tuple(t for t, e in self.delta.items() if self._readded(e))
+        # trigger -> (response, Template, markup); response বদলালে identity মেলে না, আবার compile
+        self.compiled = {} if compiled is None else compiled
+
+    def _readded(self, e) -> bool:
+        return e[1] is not _GONE and e[2] is not None and e[2] > self.built
+
+    def patched(self, changes: dict) -> "_Snapshot":
+        v = self.version + 1
+        delta = dict(self.delta)
+        for t, r in changes.items():
+            prev = delta.get(t)
+            present = prev[1] is not _GONE if prev else t in self.base
+            if r is _GONE or present:
+                delta[t] = (v, r, prev[2] if prev else None)     # replace: জায়গা বদলায় না
+            else:
+                delta.pop(t, None)
+                delta[t] = (v, r, v)                              # (re)add: শেষে যায়
+        return _Snapshot(self.live, v, self.built, self.base, self.matcher, delta, self.compiled)
+
+    def get(self, trg: str):
+        e = self.delta.get(trg)
+        if e is None:
+            return self.base.get(trg)
+        return None if e[1] is _GONE else e[1]
+
+    def _at_base_rank(self, trg: str) -> bool:
+        e = self.delta.get(trg)
+        return e is None or (e[1] is not _GONE and not self._readded(e))
+
+    def first(self, txt: str) -> str | None:
+        """Lowest-rank trigger in txt (base order, then triggers added since the build)."""
+        hit = self.matcher.first(txt)
+        if hit is not None:
+            if self._at_base_rank(hit):
+                return hit
+            # সবচেয়ে আগের base hit মুছে / সরে গেছে (বিরল, পরের rebuild পর্যন্ত): বাকি base ক্রমে
+            for t in self.base:
+                if t in txt and self._at_base_rank(t):
+                    return t
+        for t in self.added:
+            if t in txt:
+                return t
+        return None
+
+def _build(items: dict, version: int) -> _Snapshot:
+    base = dict(items)
+    return _Snapshot(items, version, version, base, TriggerMatcher(list(base)))
+
+def _publish(gid: int, items: dict, changes: dict) -> None:
+    """Caller holds _lock(gid): next snapshot = current + changes; matcher rebuild পরে।"""
+    snap = _MATCHERS.peek(gid)
+    if snap is None or snap.live is not items:
+        return                              # এখনো কেউ পড়েনি: প্রথম read পুরোটা বানাবে
+    snap = snap.patched(changes)
+    _MATCHERS.put(gid, snap)
+    if gid not in _REBUILD_PENDING:
+        _REBUILD_PENDING.add(gid)
+        _rebuilder().call_later(FILTER_REBUILD_SEC, _rebuild, gid)
+
+def _rebuilder() -> Scheduler:
+    global _REBUILDER
+    if _REBUILDER is None:
+        _REBUILDER = Scheduler("filter-rebuild")
+    return _REBUILDER
+
+def _rebuild(gid: int) -> None:
+    """Background: base + matcher নতুন করে (lock ছাড়া), তারপর এর মধ্যের delta সহ swap।"""
+    with _lock(gid):
+        _REBUILD_PENDING.discard(gid)
+        snap = _MATCHERS.peek(gid)
+        if snap is None or not snap.delta:
+            return
+        live, vb = snap.live, snap.version
+        base = dict(live)
+    matcher = TriggerMatcher(list(base))
+    with _lock(gid):
+        cur = _MATCHERS.peek(gid)
+        if cur is None or cur.live is not live:
+            return                          # reload / evict হয়েছে
+        delta = {t: e for t, e in cur.delta.items() if e[0] > vb}
+        new = _Snapshot(live, cur.version, vb, base, matcher, delta)
+        # মুছে ফেলা / বদলানো trigger-এর compiled reply এখানে ঝরে যায়
+        new.compiled.update((t, c) for t, c in cur.compiled.items() if new.get(t) is c[0])
+        _MATCHERS.put(gid, new)
+
+def filters_snapshot(gid: int, cfg=None) -> _Snapshot | None:
+    """None if the group has no filters. Full build only on first use / after a reload."""
+    gid = int(gid)
+    if cfg is None:
+        cfg = GROUP_SETTINGS[gid].get("filters_cfg")
+    items = cfg.get("filters") if isinstance(cfg, dict) else None
+    if not items:
+        return None
+    snap = _MATCHERS.get(gid)
+    if snap is None or snap.live is not items:
+        with _lock(gid):
+            snap = _MATCHERS.peek(gid)
+            if snap is None or snap.live is not items:
+                snap = _build(items, 0)
+                _MATCHERS.put(gid, snap)
+    return snap
+
+# ---- media replies: response["media"] = [type, file_id] (Telegram-এর file_id, re-upload নেই) ----
+# animation আগে: GIF message-এ Telegram document-ও পাঠায়, আগে document ধরলে GIF ফাইল হয়ে যায়
+_MEDIA_TYPES = ("photo", "animation", "document", "sticker", "video")
+
+def _media_of(msg):
+    """Replied message -> [type, file_id] or None (photo: সবচেয়ে বড় সাইজ)"""
+    for kind in _MEDIA_TYPES:
+        obj = getattr(msg, kind, None)
+        if obj:
+            return [kind, (obj[-1] if kind == "photo" else obj).file_id]
+    return None
+
+def _compile_response(resp: dict):
+    """(Template, reply_markup JSON) — একবার বানাই, প্রতি hit-এ শুধু render"""
+    return (compile_template(resp.get("text") or "", _FILTER_VARS),
+            buttons_markup_json(resp.get("buttons") or []))
 
 def _parse_triggers(chunk: str):
     toks = [t.strip().lower() for t in re.split(r"[,\s]+", chunk or "") if t.strip()]
@@ -75,39 +351,134 @@ def render_buttons_kb(rows):
         kb.add(*[InlineKeyboardButton(t, url=u) for (t, u) in row])
     return kb
 
-# --- PM target selection storage: PERSIST in DB using GROUP_SETTINGS[0] ---
-_PM_BUCKET_GID = 0
-_PM_KEY = "_pm_targets"
-
-def _pm_store() -> dict:
-    root = GROUP_SETTINGS[_PM_BUCKET_GID]
-    if _PM_KEY not in root or not isinstance(root.get(_PM_KEY), dict):
-        new_root = dict(root)
-        new_root[_PM_KEY] = {}
-        GROUP_SETTINGS[_PM_BUCKET_GID] = new_root  # persists to DB
-        return new_root[_PM_KEY]
-    return root[_PM_KEY]
-
-def set_pm_target(uid: int, gid: int):
-    uid = int(uid); gid = int(gid)
-    root = GROUP_SETTINGS[_PM_BUCKET_GID]
-    store = dict(root.get(_PM_KEY) or {})
-    store[str(uid)] = int(gid)
-    new_root = dict(root, **{_PM_KEY: store})
-    GROUP_SETTINGS[_PM_BUCKET_GID] = new_root  # persist
-
-def get_pm_target(uid: int):
-    store = _pm_store()
-    val = store.get(str(int(uid)))
-    return int(val) if val is not None else None
-
-def ensure_pm_target(uid: int):
-    groups = USER_GROUPS[int(uid)]
-    if groups and len(groups) == 1:
-        only_gid = next(iter(groups.keys()))
-        set_pm_target(uid, only_gid)
-        return only_gid
-    return get_pm_target(uid)
+def _cooldown_cfg(gid: int, cfg: dict):
+    if not GROUP_SETTINGS[gid].get("antiflood", True):
+        return 0.0, False
+    return float(cfg.get("cooldown", FILTER_COOLDOWN)), bool(cfg.get("coalesce", FILTER_COALESCE))
+
+def _cooldown_hit(key, window: float, m):
+    """-> ("send" | "defer" | "drop", seconds left in window). defer = first suppressed hit."""
+    now = time.monotonic()
+    st = _COOLDOWN.get(key)
+    if st is None or now >= st[0]:
+        _COOLDOWN.put(key, [now + window, 0, None], ttl=window * 2 + 1)
+        return "send", window
+    st[1] += 1; st[2] = m
+    return ("defer" if st[1] == 1 else "drop"), st[0] - now
+
+def _scheduler() -> Scheduler:
+    global _SCHED
+    if _SCHED is None:
+        _SCHED = Scheduler("filter-sched")     # cooldown flush + import progress
+    return _SCHED
+
+# ---- bulk import / export: JSONL (এক লাইনে এক ফিল্টার) বা CSV (header সহ) ----
+# {"trigger": "hi", "text": "হ্যালো {MENTION}", "buttons": [[["Site", "https://..."]]], "is_html": true}
+_RESPONSE_KEYS = ("text", "buttons", "is_html", "media")
+IMPORT_MAX_BYTES = 20 * 1024 * 1024       # Bot API getFile limit
+IMPORT_PROGRESS_SEC = 2.0
+
+def _reload_filters(gid: int) -> dict:
+    """Bulk write-এর পর একবার DB থেকে filters dict বদলাই (নতুন version)"""
+    gid = int(gid)
+    fresh = read_group_filters(gid)
+    with _lock(gid):
+        _live_filters(gid)
+        GROUP_SETTINGS[gid]["filters_cfg"]["filters"] = fresh
+        _MATCHERS.pop(gid, None)            # নতুন dict: পরের read পুরো build
+    return fresh
+
+def _export_filters(gid: int, fmt: str, fh) -> int:
+    """Stream one group's filters into binary file fh; returns the row count."""
+    n = 0
+    tw = io.TextIOWrapper(fh, encoding="utf-8-sig" if fmt == "csv" else "utf-8", newline="")
+    try:
+        w = csv.writer(tw) if fmt == "csv" else None
+        if w:
+            w.writerow(("trigger",) + _RESPONSE_KEYS)
+        for trg, resp in iter_filters(gid):
+            row = {"trigger": trg, "text": resp.get("text") or "",
+                   "buttons": resp.get("buttons") or [], "is_html": bool(resp.get("is_html", True))}
+            if resp.get("media"):
+                row["media"] = resp["media"]
+            if w:
+                w.writerow([trg, row["text"], json.dumps(row["buttons"], ensure_ascii=False), int(row["is_html"]),
+                            ":".join(row["media"]) if "media" in row else ""])
+            else:
+                tw.write(json.dumps(row, ensure_ascii=False) + "\n")
+            n += 1
+    finally:
+        tw.flush(); tw.detach()
+    return n
+
+def _import_row(rec: dict):
+    """dict -> (trigger, response) বা None (ভুল row)"""
+    trg = str(rec.get("trigger") or "").strip().lower()
+    text = rec.get("text")
+    buttons = rec.get("buttons") or []
+    if isinstance(buttons, str):
+        buttons = json.loads(buttons) if buttons.strip() else []
+    if not trg or not isinstance(text, str) or not isinstance(buttons, list):
+        return None
+    rows = [[(str(b[0]), str(b[1])) for b in row] for row in buttons]
+    is_html = rec.get("is_html", True)
+    if isinstance(is_html, str):
+        is_html = is_html.strip().lower() not in ("0", "false", "no", "")
+    resp = {"text": text, "buttons": rows, "is_html": bool(is_html)}
+    media = rec.get("media")
+    if isinstance(media, str):
+        media = media.split(":", 1) if media.strip() else None     # CSV: "photo:<file_id>"
+    if media:
+        if not isinstance(media, list) or len(media) != 2 or media[0] not in _MEDIA_TYPES:
+            return None
+        resp["media"] = [media[0], str(media[1])]
+    return trg, resp
+
+def _iter_import(fh, fmt: str, bad: list):
+    """Binary stream -> (trigger, response) rows one at a time; bad[0] = skipped rows."""
+    tf = io.TextIOWrapper(fh, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.reader(tf)
+        header = [h.strip().lower() for h in next(reader, [])]
+        if "trigger" not in header:
+            raise ValueError("CSV header-এ trigger কলাম নেই")
+        recs = (dict(zip(header, r)) for r in reader)
+    else:
+        recs = (line for line in tf if line.strip())
+    for rec in recs:
+        try:
+            if fmt != "csv":
+                rec = json.loads(rec)
+            row = _import_row(rec) if isinstance(rec, dict) else None
+        except (ValueError, TypeError, IndexError):     # ভাঙা JSON লাইন / buttons
+            row = None
+        if row is None:
+            bad[0] += 1
+        else:
+            yield row
+
+def _open_document(bot, file_id: str):
+    """Telegram file -> streaming HTTP response (পুরো ফাইল মেমরিতে নেই)"""
+    f = bot.get_file(file_id)
+    url = (apihelper.FILE_URL or "https://api.telegram.org/file/bot{0}/{1}").format(bot.token, f.file_path)
+    r = requests.get(url, stream=True, timeout=60, proxies=apihelper.proxy)
+    r.raise_for_status()
+    r.raw.decode_content = True
+    return r
+
+def _download_document(bot, file_id: str, fh, progress=None) -> int:
+    """Telegram file -> local file in 64KB chunks (memory flat, DB lock এখনো নেওয়া হয়নি)। Returns bytes."""
+    n = 0
+    with _open_document(bot, file_id) as r:
+        for chunk in iter(lambda: r.raw.read(64 * 1024), b""):
+            fh.write(chunk)
+            n += len(chunk)
+            if n > IMPORT_MAX_BYTES:
+                raise ValueError("ফাইল 20MB-এর বেশি।")
+            if progress:
+                progress(n)
+    fh.seek(0)
+    return n
 
 # ---- safe edit helper ----
 def _safe_edit_text(bot, text, chat_id, message_id, **kw):
@@ -122,11 +493,49 @@ def _safe_edit_text(bot, text, chat_id, message_id, **kw):
             return
         raise
 
+def _query_ref(query: str) -> str:
+    """Query as it goes into callback data (64-byte limit): itself, or "#<key>" kept in _QUERIES."""
+    if len(f"flt:{10 ** 9}:{query}".encode()) <= 64 and not query.startswith("#"):
+        return query
+    key = hashlib.blake2b(query.encode(), digest_size=6).hexdigest()
+    _QUERIES.put(key, query)
+    return "#" + key
+
+def _filters_listing(gid: int, offset: int = 0, query: str = ""):
+    """/filters page -> (HTML text, keyboard | None); callback data: flt:<offset>:<query | #key>"""
+    page, total, offset = filters_page(gid, offset, FILTERS_PAGE_SIZE, query)
+    if not total:
+        if query:
+            return f"🔎 মিল পাওয়া যায়নি: <code>{html.escape(query)}</code>", None
+        return "🗂 কোনো ফিল্টার নেই।", None
+    head = (f"🔎 <b>{html.escape(query)}</b>" if query else "🗂 <b>Filters</b>") + \
+           f" ({offset + 1}–{offset + len(page)} / {total})"
+    lines, size = [head], len(head)
+    for t in page:
+        line = f"• <code>{html.escape(t[:64])}</code>" + ("…" if len(t) > 64 else "")
+        size += len(line) + 1
+        if size > 3900:                    # Telegram-এর 4096 limit
+            lines.append("…")
+            break
+        lines.append(line)
+    nav = []
+    q = _query_ref(query)
+    if offset > 0:
+        nav.append(("⬅️ Prev", f"flt:{max(offset - FILTERS_PAGE_SIZE, 0)}:{q}"))
+    if offset + len(page) < total:
+        nav.append(("Next ➡️", f"flt:{offset + FILTERS_PAGE_SIZE}:{q}"))
+    kb = None
+    if nav:
+        kb = InlineKeyboardMarkup()
+        kb.row(*[InlineKeyboardButton(label, callback_data=data) for label, data in nav])
+    return "\n".join(lines), kb
+
 # ================== PUBLIC API (register) ==================
 def register(bot):
+    router = get_router(bot)
 
     # ---------- /filters_group (PM) ----------
-    @bot.message_handler(commands=['filters_group'], func=lambda m: m.chat.type == 'private')
+    @router.command('filters_group', chat_types=['private'])
     def filters_group_pm(m):
         uid = m.from_user.id
         groups = USER_GROUPS[uid]
@@ -145,7 +554,7 @@ def register(bot):
             kb.add(InlineKeyboardButton(info["title"], callback_data=f"fgrp:pick:{gid}"))
         bot.reply_to(m, "🔧 কোন গ্রুপে ফিল্টার ম্যানেজ করবেন সিলেক্ট করুন:", reply_markup=kb)
 
-    @bot.callback_query_handler(func=lambda c: c.data.startswith("fgrp:pick:"))
+    @router.callback("fgrp:pick:")
     def pick_group_cb(c):
         gid = int(c.data.split(":")[2]); uid = c.from_user.id
         set_pm_target(uid, gid)
@@ -158,13 +567,13 @@ def register(bot):
             "বাটন: <code>[Google](buttonurl://https://google.com)</code> (এক সারি: <code>&&</code>)\n"
             "ভ্যার: <code>{MENTION}</code>, <code>{GROUPNAME}</code>"
         )
-        try:
-            _safe_edit_text(bot, text, c.message.chat.id, c.message.message_id, parse_mode="HTML")
-        except Exception:
-            bot.send_message(c.message.chat.id, text, parse_mode="HTML")
+        # edit না হলে নতুন মেসেজ; দুটোই outbox দিয়ে (QueuedBot-এ edit সবসময় None ফেরত দেয়)
+        queued_send(bot, "edit_message_text", text, c.message.chat.id, c.message.message_id,
+                    parse_mode="HTML",
+                    fallback=("send_message", (c.message.chat.id, text), {"parse_mode": "HTML"}))
 
     # ---------- /filter (NO ADMIN CHECK) ----------
-    @bot.message_handler(commands=['filter', 'setfilter'])
+    @router.command('filter', 'setfilter')
     def cmd_filter(m):
         if m.chat.type in ("group", "supergroup"):
             gid = m.chat.id
@@ -176,7 +585,6 @@ def register(bot):
                 return
             chat_title = USER_GROUPS[m.from_user.id].get(gid, {}).get("title", "This Chat")
 
-        _ensure_filters_defaults(gid)
         raw = m.text or ""
 
         if m.reply_to_message:
@@ -186,11 +594,13 @@ def register(bot):
                 return
             triggers = _parse_triggers(parts[1])
             base_text = (m.reply_to_message.text or m.reply_to_message.caption or "").strip()
-            if not base_text:
-                bot.reply_to(m, "❌ রিপ্লাই করা মেসেজে কোনো টেক্সট/ক্যাপশন নেই।"); 
+            media = _media_of(m.reply_to_message)
+            if not base_text and not media:
+                bot.reply_to(m, "❌ রিপ্লাই করা মেসেজে কোনো টেক্সট/ক্যাপশন/মিডিয়া নেই।"); 
                 return
             raw_text = base_text
         else:
+            media = None
             parts_once = raw.split(None, 1)
             after_cmd = parts_once[1] if len(parts_once) > 1 else ""
             if not after_cmd:
@@ -224,12 +634,11 @@ def register(bot):
         raw_text = raw_text.replace("{GROUPNAME}", chat_title)
         msg_text, rows = parse_buttons_input(raw_text)
 
-        def _set(cfg):
-            cur = dict(cfg["filters"])
-            for trg in triggers:
-                cur[trg] = {"text": msg_text, "buttons": rows, "is_html": True}
-            cfg["filters"] = cur
-        _mutate_filters(gid, _set)
+        resp = {"text": msg_text, "buttons": rows, "is_html": True}
+        if media:
+            resp["media"] = media
+
+        add_filters(gid, dict.fromkeys(triggers, resp))
 
         bot.reply_to(
             m,
@@ -240,22 +649,36 @@ def register(bot):
         )
 
     # ---------- /filters (list) ----------
-    @bot.message_handler(commands=['filters'])
+    @router.command('filters')
     def cmd_filters(m):
         gid = m.chat.id if m.chat.type in ("group", "supergroup") else ensure_pm_target(m.from_user.id)
         if not gid:
             bot.reply_to(m, "⚠️ First select your group", parse_mode="HTML"); 
             return
-        _ensure_filters_defaults(gid)
-        items = GROUP_SETTINGS[gid]["filters_cfg"]["filters"]
-        if not items:
-            bot.reply_to(m, "🗂 কোনো ফিল্টার নেই।")
-        else:
-            lines = "\n".join([f"• <code>{t}</code>" for t in sorted(items.keys())])
-            bot.reply_to(m, "🗂 <b>Filters</b>\n" + lines, parse_mode="HTML")
+        parts = (m.text or "").split(None, 1)
+        query = parts[1].strip().lower() if len(parts) > 1 else ""
+        text, kb = _filters_listing(gid, 0, query)
+        bot.reply_to(m, text, parse_mode="HTML", reply_markup=kb)
+
+    @router.callback("flt:")
+    def filters_page_cb(c):
+        _, off, query = c.data.split(":", 2)
+        if query.startswith("#"):
+            query = _QUERIES.get(query[1:])
+            if query is None:
+                bot.answer_callback_query(c.id, "এই সার্চ পুরনো হয়ে গেছে, আবার /filters দিন")
+                return
+        chat = c.message.chat
+        gid = chat.id if chat.type in ("group", "supergroup") else ensure_pm_target(c.from_user.id)
+        if not gid:
+            bot.answer_callback_query(c.id, "First select your group")
+            return
+        text, kb = _filters_listing(gid, int(off), query)
+        bot.answer_callback_query(c.id)
+        _safe_edit_text(bot, text, chat.id, c.message.message_id, parse_mode="HTML", reply_markup=kb)
 
     # ---------- /delfilter (NO ADMIN CHECK; multiple ok) ----------
-    @bot.message_handler(commands=['delfilter', 'delfilters'])
+    @router.command('delfilter', 'delfilters')
     def cmd_delfilter(m):
         if m.chat.type in ("group", "supergroup"):
             gid = m.chat.id
@@ -265,7 +688,6 @@ def register(bot):
                 bot.reply_to(m, "⚠️ First select your group", parse_mode="HTML"); 
                 return
 
-        _ensure_filters_defaults(gid)
         parts = (m.text or "").split(None, 1)
         if len(parts) < 2 or not parts[1].strip():
             bot.reply_to(
@@ -276,43 +698,220 @@ def register(bot):
             return
         targets = _parse_triggers(parts[1])
 
-        deleted = []
-        def _del(cfg):
-            cur = dict(cfg["filters"])
-            for t in targets:
-                if t in cur:
-                    cur.pop(t, None); deleted.append(t)
-            cfg["filters"] = cur
-        _mutate_filters(gid, _del)
+        deleted = remove_filters(gid, targets)
 
         if deleted:
             bot.reply_to(m, "🗑 ডিলিট হয়েছে:\n" + "\n".join([f"• <code>{t}</code>" for t in deleted]), parse_mode="HTML")
         else:
             bot.reply_to(m, "⚠️ মিল পাওয়া যায়নি।")
 
+    # ---------- /exportfilters [jsonl|csv] ----------
+    @router.command('exportfilters')
+    def cmd_exportfilters(m):
+        gid = m.chat.id if m.chat.type in ("group", "supergroup") else ensure_pm_target(m.from_user.id)
+        if not gid:
+            bot.reply_to(m, "⚠️ First select your group", parse_mode="HTML")
+            return
+        parts = (m.text or "").split()
+        fmt = "csv" if len(parts) > 1 and parts[1].lower() == "csv" else "jsonl"
+        # document আর progress message সরাসরি পাঠাই (outbox retry-তে file position হারায়)
+        raw = bot._bot if isinstance(bot, QueuedBot) else bot
+        with tempfile.TemporaryFile() as fh:
+            n = _export_filters(gid, fmt, fh)
+            if not n:
+                bot.reply_to(m, "🗂 কোনো ফিল্টার নেই।")
+                return
+            fh.seek(0)
+            raw.send_document(m.chat.id, fh, visible_file_name=f"filters_{gid}.{fmt}",
+                              caption=f"🗂 {n}টা ফিল্টার", reply_to_message_id=m.message_id)
+
+    # ---------- /importfilters [replace] (document-এ রিপ্লাই বা caption) ----------
+    @router.command('importfilters')
+    def cmd_importfilters(m):
+        _import_from(m, m.reply_to_message, m.text)
+
+    @router.message(
+        content_types=['document'],
+        func=lambda m: (m.caption or "").lower().startswith("/importfilters")
+    )
+    def doc_importfilters(m):
+        _import_from(m, m, m.caption)
+
+    def _import_from(m, doc_msg, cmd_text):
+        gid = m.chat.id if m.chat.type in ("group", "supergroup") else ensure_pm_target(m.from_user.id)
+        if not gid:
+            bot.reply_to(m, "⚠️ First select your group", parse_mode="HTML")
+            return
+        doc = getattr(doc_msg, "document", None) if doc_msg else None
+        if doc is None:
+            bot.reply_to(
+                m,
+                "ব্যবহার: JSONL/CSV ফাইলে রিপ্লাই করে <code>/importfilters</code>\n"
+                "<code>/importfilters replace</code> = আগের সব ফিল্টার মুছে নতুনগুলো",
+                parse_mode="HTML",
+            )
+            return
+        if (doc.file_size or 0) > IMPORT_MAX_BYTES:
+            bot.reply_to(m, "❌ ফাইল 20MB-এর বেশি।")
+            return
+        replace = "replace" in (cmd_text or "").lower().split()[1:]
+        fmt = "csv" if (doc.file_name or "").lower().endswith(".csv") else "jsonl"
+        raw = bot._bot if isinstance(bot, QueuedBot) else bot
+        prog = {"msg": None, "t": time.monotonic(), "bg": False}
+
+        def show(text, final=False):
+            try:
+                if prog["msg"] is None:
+                    if final:
+                        bot.reply_to(m, text)
+                    else:
+                        prog["msg"] = raw.reply_to(m, text)
+                else:
+                    _safe_edit_text(raw, text, prog["msg"].chat.id, prog["msg"].message_id)
+            except Exception:
+                if final:
+                    bot.reply_to(m, text)
+
+        def reporter(fmt_text, background=False):
+            def progress(n):
+                now = time.monotonic()
+                if now - prog["t"] < IMPORT_PROGRESS_SEC:
+                    return
+                prog["t"] = now
+                if background:
+                    # DB transaction-এর ভেতর থেকে ডাকা হয়: Bot API কল scheduler thread-এ, lock ধরে নয়
+                    prog["bg"] = True
+                    _scheduler().call_later(0, show, fmt_text(n))
+                else:
+                    show(fmt_text(n))
+            return progress
+
+        bad = [0]
+        try:
+            # আগে local temp file-এ, তারপর এক transaction-এ লোকাল ফাইল থেকে পড়ি: write lock
+            # download বা Bot API কলের সময় ধরা থাকে না
+            with tempfile.TemporaryFile() as tmp:
+                _download_document(bot, doc.file_id, tmp,
+                                   reporter(lambda n: f"⏳ ফাইল ডাউনলোড হচ্ছে… {n // 1024}KB"))
+                n = import_filters(gid, _iter_import(tmp, fmt, bad), replace=replace,
+                                   progress=reporter(lambda n: f"⏳ ইমপোর্ট হচ্ছে… {n}টা ফিল্টার", True))
+        except ValueError as e:
+            bot.reply_to(m, f"❌ {e}")
+            return
+        except Exception:
+            bot.reply_to(m, "❌ ফাইল পড়া যায়নি, কিছুই বদলায়নি।")
+            return
+        total = len(_reload_filters(gid))
+        text = f"✅ {n}টা ফিল্টার ইমপোর্ট হয়েছে (মোট {total})"
+        if bad[0]:
+            text += f", {bad[0]}টা ভুল লাইন বাদ"
+        if prog["bg"]:
+            _scheduler().call_later(0, show, text, True)    # বাকি progress edit-এর পরে
+        else:
+            show(text, True)
+
+    # ---------- /filtercooldown <sec> [merge|nomerge] ----------
+    @router.command('filtercooldown')
+    def cmd_filtercooldown(m):
+        gid = m.chat.id if m.chat.type in ("group", "supergroup") else ensure_pm_target(m.from_user.id)
+        if not gid:
+            bot.reply_to(m, "⚠️ First select your group", parse_mode="HTML")
+            return
+        g = GROUP_SETTINGS[gid]
+        parts = (m.text or "").split()
+        if len(parts) < 2:
+            window, coalesce = _cooldown_cfg(gid, g.get("filters_cfg") or {})
+            bot.reply_to(
+                m,
+                f"⏱ Cooldown: <b>{window:g}s</b>, merge: <b>{'on' if coalesce else 'off'}</b>\n"
+                "ব্যবহার: <code>/filtercooldown 10 merge</code> (0 = বন্ধ)",
+                parse_mode="HTML",
+            )
+            return
+        try:
+            sec = max(float(parts[1]), 0.0)
+        except ValueError:
+            bot.reply_to(m, "❌ সেকেন্ড সংখ্যায় দিন।")
+            return
+        # add_filters / _reload_filters-এর সাথে একই lock: filters_cfg-এর read-copy-assign হারায় না
+        with _lock(gid):
+            g = GROUP_SETTINGS[gid]
+            cfg = dict(g.get("filters_cfg") or {}); cfg["cooldown"] = sec
+            if len(parts) > 2:
+                cfg["coalesce"] = parts[2].lower() in ("merge", "on", "yes")
+            g["filters_cfg"] = cfg
+            GROUP_SETTINGS[gid] = g
+        bot.reply_to(m, f"✅ Cooldown <b>{sec:g}s</b> সেট হয়েছে।", parse_mode="HTML")
+
     # ---------- Group listener: trigger match ----------
-    @bot.message_handler(
+    @router.message(
         content_types=['text', 'photo', 'video', 'document', 'animation'],
         func=lambda m: m.chat and m.chat.type in ("group", "supergroup")
     )
     def _filter_guard(m):
         gid = m.chat.id
-        _ensure_filters_defaults(gid)
-        items = GROUP_SETTINGS[gid]["filters_cfg"]["filters"]
-        if not items:
+        cfg = GROUP_SETTINGS[gid].get("filters_cfg")
+        snap = filters_snapshot(gid, cfg)
+        if snap is None:
             return
         txt = ((m.text or "") + " " + (m.caption or "")).lower().strip()
         if not txt:
             return
 
-        for trg, resp in items.items():
-            if trg in txt:
-                out = (resp.get("text") or "")
-                out = out.replace("{MENTION}", f"<a href='tg://user?id={m.from_user.id}'>{m.from_user.first_name}</a>")
-                out = out.replace("{GROUPNAME}", m.chat.title or str(gid))
-                kb = render_buttons_kb(resp.get("buttons") or [])
-                try:
-                    bot.reply_to(m, out, reply_markup=kb, parse_mode="HTML", disable_web_page_preview=False)
-                except Exception:
-                    bot.reply_to(m, resp.get("text",""), reply_markup=kb, disable_web_page_preview=False)
-                break
+        # এক পাসে সব ট্রিগার; first match wins (insertion order)
+        trg = snap.first(txt)
+        if trg is None:
+            return
+        metrics.inc("filter_matches_total")
+        window, coalesce = _cooldown_cfg(gid, cfg)
+        if window > 0:
+            act, left = _cooldown_hit((gid, trg), window, m)
+            if act == "defer" and coalesce:
+                _scheduler().call_later(left, _flush_cooldown, (gid, trg), window)
+            if act != "send":
+                return
+        _send_filter_reply(m, gid, trg, snap)
+
+    def _flush_cooldown(key, window):
+        st = _COOLDOWN.pop(key)
+        if not st or not st[1] or st[2] is None:
+            return
+        # coalesced reply = নতুন window শুরু
+        _COOLDOWN.put(key, [time.monotonic() + window, 0, None], ttl=window * 2 + 1)
+        _send_filter_reply(st[2], key[0], key[1])
+
+    def _send_filter_reply(m, gid, trg, snap=None):
+        snap = snap or filters_snapshot(gid)
+        resp = snap.get(trg) if snap else None
+        if resp is None:
+            return
+        # প্রতি trigger-এ একবার compile; snapshot-গুলো cache ভাগ করে, rebuild-এ prune হয়
+        compiled = snap.compiled
+        c = compiled.get(trg)
+        if c is None or c[0] is not resp:
+            c = compiled[trg] = (resp, *_compile_response(resp))
+        _, tpl, kb = c
+        vals = {}
+        if "MENTION" in tpl.names:
+            vals["MENTION"] = f"<a href='tg://user?id={m.from_user.id}'>{m.from_user.first_name}</a>"
+        if "GROUPNAME" in tpl.names:
+            vals["GROUPNAME"] = m.chat.title or str(gid)
+        out = tpl.render(vals)
+        media = resp.get("media")
+        if media:
+            # file_id দিয়ে পাঠাই: Telegram নিজেই serve করে; sticker-এ caption হয় না
+            kind, file_id = media
+            kw = {"reply_markup": kb, "reply_to_message_id": m.message_id, "allow_sending_without_reply": True}
+            if kind != "sticker" and out:
+                fb = ((m.chat.id, file_id), dict(kw, caption=resp.get("text", "")))
+                kw.update(caption=out, parse_mode="HTML")
+            else:
+                fb = None
+            queued_send(bot, "send_" + kind, m.chat.id, file_id, priority=PRIO_AUTO, fallback=fb, **kw)
+            return
+        # auto-reply = low priority; HTML ভুল হলে plain text fallback
+        queued_reply(
+            bot, m, out, priority=PRIO_AUTO,
+            fallback=((m, resp.get("text", "")), {"reply_markup": kb, "disable_web_page_preview": False}),
+            reply_markup=kb, parse_mode="HTML", disable_web_page_preview=False,
+        )
@@ -0,0 +1,300 @@
+# outbox.py
+# Outbound send queue: handler শুধু enqueue করে ফিরে যায়, sender thread-রা পাঠায়।
+# - token bucket: per-chat (group ~20/min, private ~1/s) + global (~30/s)
+# - priority: command replies আগে, filter auto-replies পরে (পুরনো auto-reply drop)
+# - 429 হলে retry_after মেনে ওই চ্যাট pause + আবার চেষ্টা
+# - এক চ্যাটের একটাই job একসাথে in-flight (sender thread কয়েকটা হলেও চ্যাটের ভেতরে ক্রম ঠিক থাকে)
+from __future__ import annotations
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+
+from telebot.apihelper import ApiTelegramException
+
+import metrics
+from cache import LRUCache
+
+logger = logging.getLogger("TeleBot")
+
+PRIO_COMMAND = 0
+PRIO_AUTO = 1
+
+GLOBAL_RATE = float(os.environ.get("BOT_GLOBAL_RATE", "30"))            # msgs/sec
+GROUP_RATE_PER_MIN = float(os.environ.get("BOT_GROUP_RATE_PER_MIN", "20"))
+PRIVATE_RATE = float(os.environ.get("BOT_PRIVATE_RATE", "1"))           # msgs/sec
+CHAT_BURST = float(os.environ.get("BOT_CHAT_BURST", "5"))
+OUTBOX_MAX = int(os.environ.get("BOT_OUTBOX_MAX", "10000"))
+OUTBOX_SENDERS = int(os.environ.get("BOT_OUTBOX_SENDERS", "4"))
+AUTO_MAX_AGE = float(os.environ.get("BOT_AUTO_REPLY_MAX_AGE", "30"))    # sec; এর বেশি পুরনো auto-reply বাদ
+MAX_RETRIES = 3
+
+# method -> chat_id বের করার নিয়ম (positional index, kw name)
+_CHAT_ARG = {
+    "edit_message_text": (1, "chat_id"),
+    "edit_message_reply_markup": (0, "chat_id"),
+}
+QUEUED_METHODS = frozenset({
+    "reply_to", "send_message", "edit_message_text", "edit_message_reply_markup",
+    "send_photo", "send_document", "send_sticker", "send_video", "send_animation",
+})
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "ts", "paused_until")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate, self.burst = rate, burst
+        self.tokens, self.ts = burst, time.monotonic()
+        self.paused_until = 0.0
+
+    def wait_time(self, now: float) -> float:
+        """0 if a token is available now, else seconds to wait."""
+        if now < self.paused_until:
+            return self.paused_until - now
+        self.tokens = min(self.burst, self.tokens + (now - self.ts) * self.rate)
+        self.ts = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+
+class _Job:
+    __slots__ = ("method", "args", "kwargs", "chat_id", "priority", "created", "retries", "fallback", "seq")
+
+    def __init__(self, method, args, kwargs, chat_id, priority, fallback):
+        self.method, self.args, self.kwargs = method, args, kwargs
+        self.chat_id, self.priority, self.fallback = chat_id, priority, fallback
+        self.created = time.monotonic()
+        self.retries = 0
+        self.seq = 0
+
+
+def _chat_of(method: str, args, kwargs):
+    if method == "reply_to":
+        return int(args[0].chat.id)
+    idx, kw = _CHAT_ARG.get(method, (0, "chat_id"))
+    if kw in kwargs:
+        return kwargs[kw]
+    return args[idx] if len(args) > idx else None
+
+
+class Outbox:
+    def __init__(self, bot, senders: int = OUTBOX_SENDERS, maxsize: int = OUTBOX_MAX):
+        self.bot = bot
+        self.maxsize = maxsize
+        self._ready: list = []          # (priority, seq, job)
+        self._delayed: list = []        # (ready_at, seq, job)
+        self._busy: set = set()         # chat_ids with a job being sent right now
+        self._parked: dict = {}         # chat_id -> [(priority, seq, job)] waiting for that send
+        self._nparked = 0
+        self._seq = itertools.count()
+        self._cv = threading.Condition()
+        self._global = TokenBucket(GLOBAL_RATE, GLOBAL_RATE)
+        self._chats = LRUCache(50000)   # chat_id -> TokenBucket (idle bucket = full, evict ok)
+        self.sent = 0
+        self.retried = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.dropped = {PRIO_COMMAND: 0, PRIO_AUTO: 0}
+        self._threads = [
+            threading.Thread(target=self._run, name=f"outbox-{i}", daemon=True)
+            for i in range(max(senders, 1))
+        ]
+        for t in self._threads:
+            t.start()
+        metrics.register_collector(self._metric_rows)
+
+    # ---- producer side ----
+    def put(self, method: str, args=(), kwargs=None, priority: int = PRIO_COMMAND, fallback=None) -> bool:
+        """Enqueue one Bot API call; False if dropped (queue full)."""
+        job = _Job(method, tuple(args), dict(kwargs or {}), _chat_of(method, args, kwargs or {}),
+                   priority, fallback)
+        with self._cv:
+            if len(self._ready) + len(self._delayed) + self._nparked >= self.maxsize:
+                self.dropped[priority] = self.dropped.get(priority, 0) + 1
+                return False
+            job.seq = next(self._seq)
+            heapq.heappush(self._ready, (priority, job.seq, job))
+            self._cv.notify()
+        return True
+
+    def stats(self) -> dict:
+        with self._cv:
+            depth = {}
+            for p, _, _ in self._ready:
+                depth[p] = depth.get(p, 0) + 1
+            return {"depth": depth, "delayed": len(self._delayed), "parked": self._nparked, "sent": self.sent,
+                    "retried": self.retried, "rate_limited": self.rate_limited,
+                    "errors": self.errors, "dropped": dict(self.dropped)}
+
+    def _metric_rows(self) -> list:
+        st = self.stats()
+        rows = [("outbox_depth", "gauge", {"priority": str(p)}, n) for p, n in st["depth"].items()]
+        rows += [("outbox_dropped_total", "counter", {"priority": str(p)}, n) for p, n in st["dropped"].items()]
+        rows += [("outbox_delayed", "gauge", {}, st["delayed"]),
+                 ("outbox_parked", "gauge", {}, st["parked"]),
+                 ("outbox_sent_total", "counter", {}, st["sent"]),
+                 ("outbox_retried_total", "counter", {}, st["retried"]),
+                 ("outbox_rate_limited_total", "counter", {}, st["rate_limited"]),
+                 ("outbox_errors_total", "counter", {}, st["errors"])]
+        return rows
+
+    # ---- sender side ----
+    def _bucket(self, chat_id) -> TokenBucket | None:
+        if chat_id is None:
+            return None
+        b = self._chats.get(chat_id)
+        if b is None:
+            if isinstance(chat_id, int) and chat_id > 0:
+                b = TokenBucket(PRIVATE_RATE, max(CHAT_BURST, 1))
+            else:
+                b = TokenBucket(GROUP_RATE_PER_MIN / 60.0, max(CHAT_BURST, 1))
+            self._chats.put(chat_id, b)
+        return b
+
+    def _next_job(self):
+        """Block until a job may be sent under all limits; caller holds no lock."""
+        with self._cv:
+            while True:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    _, seq, job = heapq.heappop(self._delayed)
+                    heapq.heappush(self._ready, (job.priority, seq, job))
+                if not self._ready:
+                    timeout = (self._delayed[0][0] - now) if self._delayed else None
+                    self._cv.wait(timeout)
+                    continue
+                prio, seq, job = self._ready[0]
+                if prio >= PRIO_AUTO and now - job.created > AUTO_MAX_AGE:
+                    heapq.heappop(self._ready)
+                    self.dropped[prio] = self.dropped.get(prio, 0) + 1
+                    continue
+                if job.chat_id in self._busy:
+                    # অন্য sender এই চ্যাটে পাঠাচ্ছে: শেষ হলে (_done) seq সহ ready-তে ফেরে
+                    heapq.heappop(self._ready)
+                    self._parked.setdefault(job.chat_id, []).append((prio, seq, job))
+                    self._nparked += 1
+                    continue
+                bucket = self._bucket(job.chat_id)
+                w = bucket.wait_time(now) if bucket is not None else 0.0
+                if w > 0:
+                    # এই চ্যাট অপেক্ষায়; অন্য চ্যাটের job আগাতে পারে
+                    heapq.heappop(self._ready)
+                    heapq.heappush(self._delayed, (now + w, seq, job))
+                    continue
+                g = self._global.wait_time(now)
+                if g > 0:
+                    self._cv.wait(g)
+                    continue
+                heapq.heappop(self._ready)
+                self._global.take()
+                if bucket is not None:
+                    bucket.take()
+                if job.chat_id is not None:
+                    self._busy.add(job.chat_id)
+                return job
+
+    def _done(self, job: _Job) -> None:
+        if job.chat_id is None:
+            return
+        with self._cv:
+            self._busy.discard(job.chat_id)
+            parked = self._parked.pop(job.chat_id, ())
+            if parked:
+                self._nparked -= len(parked)
+                for item in parked:
+                    heapq.heappush(self._ready, item)
+                self._cv.notify_all()
+
+    def _run(self):
+        while True:
+            job = self._next_job()
+            try:
+                getattr(self.bot, job.method)(*job.args, **job.kwargs)
+            except Exception as e:
+                self._on_error(job, e)
+            else:
+                with self._cv:
+                    self.sent += 1
+            finally:
+                self._done(job)
+
+    def _on_error(self, job: _Job, e: Exception):
+        if isinstance(e, ApiTelegramException) and e.error_code == 429:
+            retry_after = float((e.result_json.get("parameters") or {}).get("retry_after") or 1)
+            with self._cv:
+                self.rate_limited += 1
+                b = self._bucket(job.chat_id)
+                until = time.monotonic() + retry_after
+                if b is not None:
+                    b.paused_until = max(b.paused_until, until)
+                if job.retries < MAX_RETRIES:
+                    job.retries += 1
+                    self.retried += 1
+                    # আসল seq রাখি: একই চ্যাটের পরে আসা মেসেজ এর আগে চলে যাবে না
+                    heapq.heappush(self._delayed, (until, job.seq, job))
+                    self._cv.notify()
+                else:
+                    self.dropped[job.priority] = self.dropped.get(job.priority, 0) + 1
+            return
+        if "message is not modified" in str(e).lower():
+            return
+        if job.fallback is not None:
+            self.put(*_unpack_fallback(job.method, job.fallback), priority=job.priority)
+            return
+        with self._cv:
+            self.errors += 1
+        logger.error("outbox %s failed: %r", job.method, e)
+
+
+class QueuedBot:
+    """
+    Bot proxy: send-type calls (reply_to, send_message, edit_message_text, ...)
+    are enqueued on the Outbox and return None; everything else passes through.
+    """
+    def __init__(self, bot, outbox: Outbox):
+        self._bot = bot
+        self.outbox = outbox
+
+    def __getattr__(self, name):
+        attr = getattr(self._bot, name)
+        if name not in QUEUED_METHODS:
+            return attr
+
+        def enqueue(*args, **kwargs):
+            self.outbox.put(name, args, kwargs, priority=PRIO_COMMAND)
+        return enqueue
+
+
+def _unpack_fallback(method: str, fallback):
+    """(args, kwargs) -> same method; (method, args, kwargs) -> another QUEUED_METHODS call."""
+    return tuple(fallback) if len(fallback) == 3 else (method, *fallback)
+
+
+def send(bot, method: str, *args, priority: int = PRIO_COMMAND, fallback=None, **kwargs):
+    """
+    Any QUEUED_METHODS call with a priority; fallback = (args, kwargs) for the same method,
+    or (method, args, kwargs), if the first try fails ("message is not modified" is not a failure).
+    Without an outbox this sends inline (same fallback semantics).
+    """
+    if isinstance(bot, QueuedBot):
+        bot.outbox.put(method, args, kwargs, priority=priority, fallback=fallback)
+        return
+    try:
+        getattr(bot, method)(*args, **kwargs)
+    except Exception as e:
+        if fallback is None:
+            raise
+        if "message is not modified" in str(e).lower():
+            return
+        fb_method, fb_args, fb_kwargs = _unpack_fallback(method, fallback)
+        getattr(bot, fb_method)(*fb_args, **fb_kwargs)
+
+
+def reply_to(bot, message, text, priority: int = PRIO_COMMAND, fallback=None, **kwargs):
+    """reply_to with a priority (see send)."""
+    send(bot, "reply_to", message, text, priority=priority, fallback=fallback, **kwargs)
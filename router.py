@@ -0,0 +1,121 @@
+# router.py
+# Indexed handler routing: command name -> handlers, callback data prefix (":"-এর আগের অংশ)
+# -> handlers (dict lookup)। বাকি message handler registration order-এ।
+# telebot-এ শুধু একটা message + একটা callback handler বসে, তাই handler যত বাড়ুক
+# প্রতি update-এ predicate scan বাড়ে না।
+#
+#   router = get_router(bot)
+#   @router.command("filter", "setfilter")
+#   @router.callback("fgrp:pick:")
+#   @router.message(content_types=["text"], func=lambda m: ...)
+#
+# নিয়ম: command handler আগে দেখা হয়, মিললে সেটাই; না মিললে message handler গুলো ক্রমে।
+from __future__ import annotations
+
+from telebot import util
+
+ALL_CONTENT_TYPES = util.content_type_media + util.content_type_service
+
+
+def command_of(m) -> str | None:
+    """'/Filter@MyBot a b' -> 'filter' (telebot-এর মতো @bot অংশ উপেক্ষা)."""
+    text = m.text if getattr(m, "content_type", "text") == "text" else None
+    if not text or text[0] != "/":
+        return None
+    return text.split(None, 1)[0][1:].split("@", 1)[0].lower()
+
+
+class Router:
+    def __init__(self):
+        self._commands: dict = {}        # name -> [[handler, func, chat_types]]
+        self._callbacks: dict = {}       # first prefix segment -> [[handler, prefix, func]]
+        self._cb_scan: list = []         # prefix ছাড়া / ":" ছাড়া prefix -> [[handler, prefix, func]]
+        self._messages: list = []        # [[handler, content_types, func]]
+
+    # ---- registration ----
+    def command(self, *names, func=None, chat_types=None):
+        types = frozenset(chat_types) if chat_types else None
+
+        def deco(fn):
+            ent = [fn, func, types]
+            for n in names:
+                self._commands.setdefault(n.lower(), []).append(ent)
+            return fn
+        return deco
+
+    def callback(self, prefix: str = "", func=None):
+        def deco(fn):
+            ent = [fn, prefix, func]
+            head, sep, _ = prefix.partition(":")
+            if sep:
+                self._callbacks.setdefault(head, []).append(ent)
+            else:
+                self._cb_scan.append(ent)
+            return fn
+        return deco
+
+    def message(self, content_types=("text",), func=None):
+        def deco(fn):
+            self._messages.append([fn, frozenset(content_types), func])
+            return fn
+        return deco
+
+    # ---- dispatch ----
+    def dispatch_message(self, m) -> bool:
+        name = command_of(m)
+        if name is not None:
+            for fn, func, types in self._commands.get(name, ()):
+                if (types is None or m.chat.type in types) and (func is None or func(m)):
+                    fn(m)
+                    return True
+        ct = m.content_type
+        for fn, types, func in self._messages:
+            if ct in types and (func is None or func(m)):
+                fn(m)
+                return True
+        return False
+
+    def dispatch_callback(self, c) -> bool:
+        data = c.data or ""
+        head = data.partition(":")[0]
+        for fn, prefix, func in self._callbacks.get(head, ()):
+            if data.startswith(prefix) and (func is None or func(c)):
+                fn(c)
+                return True
+        for fn, prefix, func in self._cb_scan:
+            if data.startswith(prefix) and (func is None or func(c)):
+                fn(c)
+                return True
+        return False
+
+    # ---- introspection (metrics / bench) ----
+    def _entries(self):
+        seen = set()
+        for lst in (*self._commands.values(), *self._callbacks.values(), self._cb_scan, self._messages):
+            for ent in lst:
+                if id(ent) not in seen:
+                    seen.add(id(ent))
+                    yield ent
+
+    def handlers(self) -> dict:
+        """{function name: handler}"""
+        return {ent[0].__name__: ent[0] for ent in self._entries()}
+
+    def wrap_handlers(self, wrapper) -> None:
+        """ent[0] = wrapper(ent[0]) — metrics timing ইত্যাদি"""
+        for ent in self._entries():
+            ent[0] = wrapper(ent[0])
+
+    def install(self, bot) -> None:
+        bot.message_handler(content_types=ALL_CONTENT_TYPES)(self.dispatch_message)
+        bot.callback_query_handler(func=lambda c: True)(self.dispatch_callback)
+
+
+def get_router(bot) -> Router:
+    """One Router per bot, installed on first use (main.py আগে ডাকে, তাই telebot-এ প্রথমে বসে)."""
+    r = vars(bot).get("_router")
+    if r is None:
+        r = Router()
+        r.install(bot)
+        bot._router = r
+    return r
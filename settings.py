@@ -0,0 +1,175 @@
+# settings.py
+# Group settings = এক shared immutable DEFAULTS + per-group sparse overrides।
+# GROUP_SETTINGS[gid] একটা GroupConfig দেয় (dict-এর মতো পড়া যায়); memory আর groups.data blob-এ
+# শুধু default থেকে আলাদা key থাকে, তাই খরচ বাড়ে customise করা setting-এর সাথে, group সংখ্যার সাথে নয়।
+# Nested default (welcome_cfg) key-by-key layered: পড়লে নতুন plain dict (list, tuple নয়), বদলাতে হলে
+# আবার assign করুন — অথবা Section (utils.welcome_cfg) নিন, যেটা বদলালে নিজেই লিখে দেয়।
+from __future__ import annotations
+from collections.abc import Mapping, MutableMapping
+from types import MappingProxyType
+
+DEFAULTS = MappingProxyType({
+    "antispam": True, "antiflood": True, "goodbye": False, "alphabets": False,
+    "captcha": False, "checks": False, "media": True, "porn": True, "warns": True,
+    "night": False, "link": True, "deleting": False,
+    "rules_url": "https://t.me/",
+    "welcome_cfg": MappingProxyType({"enabled": True, "mode": "always", "delete_last": False,
+                                     "text": "", "media": None, "buttons": ()}),
+})
+
+_MISSING = object()
+
+
+def _same(v, d) -> bool:
+    if isinstance(v, (list, tuple)) and isinstance(d, (list, tuple)):
+        return list(v) == list(d)
+    return v == d
+
+
+def sparse(value: Mapping, defaults: Mapping = DEFAULTS) -> dict:
+    """Only the keys that differ from defaults (nested default dicts recursively).
+    Non-default values are kept by reference (filters_cfg ইত্যাদি কপি হয় না)."""
+    out = {}
+    for k, v in value.items():
+        d = defaults.get(k, _MISSING)
+        if d is _MISSING:
+            out[k] = v
+        elif isinstance(d, Mapping) and isinstance(v, Mapping):
+            v = sparse(v, d)
+            if v:
+                out[k] = v
+        elif not _same(v, d):
+            out[k] = v
+    return out
+
+
+def _plain(v):
+    """Fresh mutable copy: Mapping -> dict, tuple/list -> list (shared DEFAULTS কখনো বাইরে যায় না)."""
+    if isinstance(v, Mapping):
+        return {k: _plain(x) for k, x in v.items()}
+    if isinstance(v, (list, tuple)):
+        return [_plain(x) for x in v]
+    return v
+
+
+class Section(dict):
+    """
+    Plain dict copy of one nested setting that writes itself back on change:
+    d[k] = v / del d[k] / update / pop / setdefault / clear -> save(dict(self)).
+    Nested list (buttons) জায়গায় বদলালে key আবার assign করুন।
+    """
+    __slots__ = ("_save",)
+
+    def __init__(self, data: Mapping, save):
+        super().__init__(data)
+        self._save = save
+
+    def _commit(self) -> None:
+        self._save(dict(self))
+
+    def __setitem__(self, key, value) -> None:
+        super().__setitem__(key, value)
+        self._commit()
+
+    def __delitem__(self, key) -> None:
+        super().__delitem__(key)
+        self._commit()
+
+    def update(self, *args, **kwargs) -> None:
+        super().update(*args, **kwargs)
+        self._commit()
+
+    def pop(self, key, *default):
+        had = key in self
+        value = super().pop(key, *default)
+        if had:
+            self._commit()
+        return value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def clear(self) -> None:
+        super().clear()
+        self._commit()
+
+
+class GroupConfig(MutableMapping):
+    """One group's settings: overrides dict (None = সব default) layered over DEFAULTS."""
+    __slots__ = ("_over",)
+
+    def __init__(self, overrides: dict | None = None):
+        self._over = overrides or None
+
+    @classmethod
+    def of(cls, value: Mapping | None) -> "GroupConfig":
+        """Any mapping (full legacy blob, overrides, GroupConfig) -> GroupConfig."""
+        if isinstance(value, GroupConfig):
+            return value
+        return cls(sparse(value) if value else None)
+
+    def overrides(self) -> dict:
+        """The persisted form (plain dict, may be empty)."""
+        return self._over or {}
+
+    def __getitem__(self, key):
+        over = self._over
+        d = DEFAULTS.get(key, _MISSING)
+        if over is not None and key in over:
+            v = over[key]
+            if isinstance(d, Mapping) and isinstance(v, Mapping):
+                return _plain({**d, **v})
+            return v                        # by reference (filters_cfg জায়গায় বদলায়)
+        if d is _MISSING:
+            raise KeyError(key)
+        return _plain(d) if isinstance(d, Mapping) else d
+
+    def get(self, key, default=None):
+        over = self._over
+        if (over is None or key not in over) and key not in DEFAULTS:
+            return default
+        return self[key]
+
+    def __setitem__(self, key, value) -> None:
+        d = DEFAULTS.get(key, _MISSING)
+        if d is not _MISSING:
+            if isinstance(d, Mapping) and isinstance(value, Mapping):
+                value = sparse(value, d)
+                same = not value
+            else:
+                same = _same(value, d)
+            if same:
+                self._drop(key)
+                return
+        if self._over is None:
+            self._over = {}
+        self._over[key] = value
+
+    def __delitem__(self, key) -> None:
+        """Override বাদ (default-এ ফেরত)."""
+        if not self._drop(key):
+            raise KeyError(key)
+
+    def _drop(self, key) -> bool:
+        if self._over is None or key not in self._over:
+            return False
+        del self._over[key]
+        if not self._over:
+            self._over = None
+        return True
+
+    def __contains__(self, key) -> bool:
+        return key in DEFAULTS or (self._over is not None and key in self._over)
+
+    def __iter__(self):
+        yield from DEFAULTS
+        if self._over:
+            yield from (k for k in self._over if k not in DEFAULTS)
+
+    def __len__(self) -> int:
+        return len(DEFAULTS) + sum(1 for k in (self._over or ()) if k not in DEFAULTS)
+
+    def __repr__(self) -> str:
+        return f"GroupConfig({self._over or {}!r})"
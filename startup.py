@@ -0,0 +1,115 @@
+# startup.py
+# Startup timing breakdown + deferred group hydration।
+#   BOT_PRELOAD=lazy (default)  -> কিছুই আগে লোড নয়, group প্রথম মেসেজে লোড হয়
+#   BOT_PRELOAD=background      -> polling সাথে সাথে শুরু, পেছনের thread group cache warm করে
+#   BOT_PRELOAD=eager           -> polling-এর আগে warm (পুরনো আচরণের মতো)
+# BOT_PRELOAD_LIMIT: কতগুলো group warm হবে (0 = BOT_GROUP_CACHE_SIZE পর্যন্ত)
+from __future__ import annotations
+import inspect
+import logging
+import os
+import threading
+import time
+
+import metrics
+
+logger = logging.getLogger("TeleBot")
+
+T0 = time.perf_counter()          # main.py এটা সবার আগে import করে
+PRELOAD = os.environ.get("BOT_PRELOAD", "lazy")
+PRELOAD_LIMIT = int(os.environ.get("BOT_PRELOAD_LIMIT", "0"))
+
+_PHASES: dict = {}                # phase -> seconds since T0 (or duration for "hydrate")
+_lock = threading.Lock()
+
+
+def mark(phase: str, seconds: float | None = None) -> None:
+    """First call wins; seconds=None -> elapsed since process start."""
+    with _lock:
+        _PHASES.setdefault(phase, time.perf_counter() - T0 if seconds is None else seconds)
+
+
+def phases() -> dict:
+    with _lock:
+        return dict(_PHASES)
+
+
+def report() -> str:
+    return " | ".join(f"{k} {v:.3f}s" for k, v in phases().items())
+
+
+metrics.register_collector(lambda: [
+    ("startup_seconds", "gauge", {"phase": k}, round(v, 6)) for k, v in phases().items()
+])
+
+
+def watch_first_update(bot) -> None:
+    """
+    প্রথম handler শেষ হলে "first_update" mark + পুরো breakdown print;
+    তারপর আসল handler ফেরত বসাই (steady state-এ কোনো overhead নেই)।
+    """
+    wrapped = []
+    done = threading.Event()
+
+    def finish():
+        if done.is_set():
+            return
+        done.set()
+        mark("first_update")
+        for h, w, orig in wrapped:
+            if h.get("function") is w:
+                h["function"] = orig
+        print("Startup:", report())
+
+    def wrap(h):
+        orig = h["function"]
+        if inspect.iscoroutinefunction(orig):
+            async def first(update):
+                try:
+                    return await orig(update)
+                finally:
+                    finish()
+        else:
+            def first(update):
+                try:
+                    return orig(update)
+                finally:
+                    finish()
+        first.__name__ = getattr(orig, "__name__", "handler")
+        h["function"] = first
+        wrapped.append((h, first, orig))
+
+    for b in metrics._raw_bots(bot):
+        for attr in metrics._HANDLER_LISTS:
+            for h in getattr(b, attr, None) or []:
+                if isinstance(h, dict) and callable(h.get("function")):
+                    wrap(h)
+
+
+def preload(keep=None) -> None:
+    """BOT_PRELOAD অনুযায়ী group cache warm; keep(gid) -> False হলে বাদ (multi-process shard)।"""
+    if PRELOAD == "eager":
+        _hydrate(keep)
+    elif PRELOAD == "background":
+        threading.Thread(target=_hydrate, args=(keep,), name="hydrate", daemon=True).start()
+
+
+def _hydrate(keep) -> None:
+    from state import hydrate_groups, GROUP_CACHE_SIZE
+    t = time.perf_counter()
+    try:
+        n = hydrate_groups(PRELOAD_LIMIT or GROUP_CACHE_SIZE, keep=keep)
+    except Exception as e:
+        logger.error("hydrate failed: %r", e)
+        return
+    mark("hydrate", time.perf_counter() - t)
+    logger.info("hydrated %d groups in %.2fs", n, time.perf_counter() - t)
+
+
+def warm_me(bot) -> None:
+    """getMe আগেভাগে cache (blocking; thread থেকে ডাকুন)। ব্যর্থ হলে পরের bot_username() আবার চেষ্টা করে।"""
+    from tgcache import get_me
+    try:
+        get_me(bot)
+    except Exception as e:
+        logger.error("get_me warm-up failed: %r", e)
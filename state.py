@@ -1,56 +1,186 @@
 # state.py
 from __future__ import annotations
-from collections.abc import MutableMapping
+import atexit
+import os
+import signal
+import sys
+import threading
+import time
+from collections.abc import Mapping, MutableMapping
 from typing import Any, Dict
 
+import metrics
+import startup
+from cache import LRUCache, MISSING, ExpiringDict, UserSet
+from settings import GroupConfig
 from db import (
     init_db,
-    load_group, save_group, load_all_groups,
-    set_user_group, get_user_groups, get_all_user_groups,
+    load_group, load_groups, group_ids, save_group, save_groups,
+    save_filters, import_filters, iter_filters, read_group_filters,
+    get_user_groups, set_group_title,
+    link_user_groups, unlink_user_groups, unlink_group, get_group_users,
+    CHANGE_LOG, data_version, change_log_head, read_changes, prune_changes,
     # ⬇️ PM target persist helpers
     set_pm_target as db_set_pm_target,
     get_pm_target as db_get_pm_target,
     clear_pm_target as db_clear_pm_target,
 )
 
-# Initialize DB at import
+# Initialize DB at import (schema + migrations only; group data লোড হয় lazily)
 init_db()
+startup.mark("db_open")
 
-# ---------- In-memory ephemeral states ----------
-PENDING_INPUT: Dict[int, dict] = {}      # per-user pending prompts
-LAST_WELCOME_MSG: Dict[int, int] = {}    # chat_id -> last message_id
-WELCOMED_ONCE: Dict[int, set] = {}       # chat_id -> set(user_id)
+# ---------- Cache bounds ----------
+# Groups / users lazily load হয়, LRU eviction; startup DB size-এর উপর নির্ভর করে না
+GROUP_CACHE_SIZE = int(os.environ.get("BOT_GROUP_CACHE_SIZE", "10000"))
+USER_CACHE_SIZE = int(os.environ.get("BOT_USER_CACHE_SIZE", "50000"))
+
+# ---------- In-memory ephemeral states (TTL + size cap, দেখুন cache.ExpiringDict) ----------
+# WELCOMED_ONCE[chat_id] = UserSet: sorted array('q'); BOT_WELCOMED_BLOOM_AT-এর বেশি id হলে Bloom filter
+EPHEMERAL_MAX = int(os.environ.get("BOT_EPHEMERAL_MAX", "100000"))          # entries per store
+PENDING_TTL = float(os.environ.get("BOT_PENDING_TTL", "900"))               # 15 min
+WELCOME_MSG_TTL = float(os.environ.get("BOT_WELCOME_MSG_TTL", str(2 * 86400)))
+WELCOMED_TTL = float(os.environ.get("BOT_WELCOMED_TTL", str(30 * 86400)))   # শেষ access থেকে; idle chat-এর set বাদ
+WELCOMED_BLOOM_AT = int(os.environ.get("BOT_WELCOMED_BLOOM_AT", "0"))       # 0 = সবসময় exact
+
+PENDING_INPUT = ExpiringDict(EPHEMERAL_MAX, PENDING_TTL)           # user_id -> pending prompt dict
+LAST_WELCOME_MSG = ExpiringDict(EPHEMERAL_MAX, WELCOME_MSG_TTL)    # chat_id -> last message_id
+WELCOMED_ONCE = ExpiringDict(                                      # chat_id -> UserSet(user_id)
+    EPHEMERAL_MAX, WELCOMED_TTL, factory=lambda: UserSet(WELCOMED_BLOOM_AT), sliding=True
+)
+
+def ephemeral_stats() -> dict:
+    """Entries + approximate bytes per ephemeral store."""
+    welcomed = list(WELCOMED_ONCE.values_raw())
+    return {
+        "pending_input": {"entries": len(PENDING_INPUT),
+                          "bytes": sum(sys.getsizeof(v) for v in PENDING_INPUT.values_raw())},
+        "last_welcome_msg": {"entries": len(LAST_WELCOME_MSG), "bytes": sum(sys.getsizeof(v) for v in LAST_WELCOME_MSG.values_raw())},
+        "welcomed_once": {"entries": len(welcomed), "users": sum(len(u) for u in welcomed),
+                          "bytes": sum(u.nbytes() for u in welcomed)},
+    }
+
+metrics.register_collector(lambda: [
+    (f"ephemeral_{k}", "gauge", {"store": store}, v)
+    for store, st in ephemeral_stats().items() for k, v in st.items()
+])
+
+# ---------- Write-behind (optional) ----------
+# BOT_WRITE_BEHIND=1 -> handler শুধু cache আপডেট করে; writer thread একই gid-এর
+# বারবার লেখা coalesce করে, BOT_WRITE_BEHIND_MS-এর মধ্যে এক transaction-এ ব্যাচ ফ্লাশ করে
+WRITE_BEHIND = os.environ.get("BOT_WRITE_BEHIND", "0") == "1"
+WRITE_BEHIND_MS = int(os.environ.get("BOT_WRITE_BEHIND_MS", "250"))
+
+class _GroupWriter:
+    """Single writer thread; gid -> latest value (older values are dropped)."""
+    def __init__(self, delay_ms: int):
+        self._delay = max(delay_ms, 0) / 1000.0
+        self._pending: Dict[int, dict] = {}
+        self._inflight: Dict[int, dict] = {}
+        self._cv = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="group-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, gid: int, value: dict) -> None:
+        with self._cv:
+            self._pending[gid] = value
+            self._cv.notify()
+
+    def peek(self, gid: int) -> dict | None:
+        """Value not yet on disk (pending or being written), else None."""
+        with self._cv:
+            v = self._pending.get(gid)
+            return v if v is not None else self._inflight.get(gid)
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._cv:
+                batch, self._pending = self._pending, {}
+                self._inflight = batch
+            if not batch:
+                return
+            try:
+                save_groups(batch.items())
+            except Exception:
+                # পরের রাউন্ডে আবার চেষ্টা (নতুন value এলে সেটাই থাকবে)
+                with self._cv:
+                    for gid, v in batch.items():
+                        self._pending.setdefault(gid, v)
+            finally:
+                with self._cv:
+                    self._inflight = {}
+
+    def _run(self) -> None:
+        while True:
+            with self._cv:
+                while not self._pending and not self._stop:
+                    self._cv.wait()
+                if self._stop:
+                    return
+            time.sleep(self._delay)   # coalesce window = latency bound
+            self.flush()
+
+    def close(self) -> None:
+        with self._cv:
+            self._stop = True
+            self._cv.notify()
+        self._thread.join(timeout=5)
+        self.flush()
+
+def _on_sigterm(signum, frame):
+    # Docker-এ bot PID 1: SIGTERM-এ default action atexit চালায় না, তাই নিজেই flush করে বের হই
+    _WRITER.close()
+    raise SystemExit(0)
+
+_WRITER = _GroupWriter(WRITE_BEHIND_MS) if WRITE_BEHIND else None
+if _WRITER is not None:
+    atexit.register(_WRITER.close)
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, _on_sigterm)
+
+def flush_groups() -> None:
+    """Write pending GROUP_SETTINGS changes now (no-op without write-behind)."""
+    if _WRITER is not None:
+        _WRITER.flush()
 
 # ---------- Persistent wrappers ----------
 
 class _GroupSettings(MutableMapping):
     """
-    chat_id -> dict persisted in SQLite 'groups' as JSON
-    - __getitem__ lazy-loads from DB if not cached
-    - __setitem__ immediately writes to DB
+    chat_id -> GroupConfig (settings.DEFAULTS + sparse overrides) persisted in SQLite 'groups' as JSON
+    - __getitem__ lazy-loads from DB if not cached (bounded LRU)
+    - __setitem__ writes the overrides to DB (immediately, or via the write-behind thread)
+    - iteration / len cover the cached gids only
     """
     def __init__(self):
-        self._cache: Dict[int, dict] = load_all_groups()
+        self._cache = LRUCache(GROUP_CACHE_SIZE)
 
-    def __getitem__(self, gid: int) -> dict:
+    def __getitem__(self, gid: int) -> GroupConfig:
         gid = int(gid)
-        if gid in self._cache:
-            return self._cache[gid]
-        data = load_group(gid) or {}
-        self._cache[gid] = data
+        data = self._cache.get(gid, MISSING)
+        if data is not MISSING:
+            return data
+        pending = _WRITER.peek(gid) if _WRITER is not None else None
+        data = GroupConfig.of(pending if pending is not None else load_group(gid))
+        self._cache.put(gid, data)
         return data
 
-    def __setitem__(self, gid: int, value: dict) -> None:
+    def __setitem__(self, gid: int, value) -> None:
         gid = int(gid)
-        if not isinstance(value, dict):
-            raise TypeError("GROUP_SETTINGS value must be dict")
-        self._cache[gid] = value
-        save_group(gid, value)
+        if not isinstance(value, Mapping):
+            raise TypeError("GROUP_SETTINGS value must be a mapping")
+        value = GroupConfig.of(value)
+        self._cache.put(gid, value)
+        if _WRITER is not None:
+            _WRITER.put(gid, value.overrides())
+        else:
+            save_group(gid, value.overrides())
 
     def __delitem__(self, gid: int) -> None:
         gid = int(gid)
-        if gid in self._cache:
-            del self._cache[gid]
+        self._cache.pop(gid, None)
         # (optional) delete from DB if you add such an op
 
     def __iter__(self):
@@ -59,32 +189,58 @@ class _GroupSettings(MutableMapping):
     def __len__(self) -> int:
         return len(self._cache)
 
+    def prime(self, gid: int, value: dict) -> bool:
+        """Warm-up insert; live (already cached / pending write) entries win."""
+        gid = int(gid)
+        if _WRITER is not None and _WRITER.peek(gid) is not None:
+            return False
+        return self._cache.add(gid, GroupConfig.of(value))
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
 GROUP_SETTINGS = _GroupSettings()
 
+def hydrate_groups(limit: int, batch: int = 500, keep=None) -> int:
+    """Background / eager warm-up: busiest groups first, batched reads. Returns groups cached."""
+    gids = [g for g in group_ids(limit) if keep is None or keep(g)]
+    n = 0
+    for i in range(0, len(gids), batch):
+        for gid, data in load_groups(gids[i:i + batch]).items():
+            n += GROUP_SETTINGS.prime(gid, data)
+    return n
+
 class _UserGroups(MutableMapping):
     """
     user_id -> { gid: { 'title': str } }
-    Backed by 'user_groups' table.
+    Backed by 'user_groups' table; lazily loaded into a bounded LRU.
+    Write-through: link / unlink / set_title আগে DB, তারপর cached dict (copy-on-write) আর
+    reverse map gid -> frozenset(user_id) (lazily loaded via idx_user_groups_gid) আপডেট করে।
     """
     def __init__(self):
-        self._cache: Dict[int, Dict[int, dict]] = get_all_user_groups()
+        self._cache = LRUCache(USER_CACHE_SIZE)
+        self._members = LRUCache(GROUP_CACHE_SIZE)    # gid -> frozenset(user_id)
+        self._lock = threading.Lock()
 
     def __getitem__(self, user_id: int) -> Dict[int, dict]:
         user_id = int(user_id)
-        if user_id in self._cache:
-            return self._cache[user_id]
-        data = get_user_groups(user_id)
-        self._cache[user_id] = data
+        data = self._cache.get(user_id, MISSING)
+        if data is not MISSING:
+            return data
+        # load + put এক lock-এ: মাঝে _apply চললে stale copy cache-এ বসে যেত
+        with self._lock:
+            data = self._cache.peek(user_id)
+            if data is None:
+                data = get_user_groups(user_id)
+                self._cache.put(user_id, data)
         return data
 
     def __setitem__(self, user_id: int, value: Dict[int, dict]) -> None:
         # Bulk set (cache only)
-        self._cache[int(user_id)] = value
+        self._cache.put(int(user_id), value)
 
     def __delitem__(self, user_id: int) -> None:
-        user_id = int(user_id)
-        if user_id in self._cache:
-            del self._cache[user_id]
+        self._cache.pop(int(user_id), None)
 
     def __iter__(self):
         return iter(self._cache)
@@ -92,30 +248,162 @@ class _UserGroups(MutableMapping):
     def __len__(self) -> int:
         return len(self._cache)
 
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+    def users_of(self, gid: int) -> frozenset:
+        """user_ids linked to gid (reverse map; miss -> one indexed query)."""
+        gid = int(gid)
+        users = self._members.get(gid, MISSING)
+        if users is MISSING:
+            with self._lock:                          # __getitem__-এর মতো: _apply-এর সাথে race নেই
+                users = self._members.peek(gid)
+                if users is None:
+                    users = frozenset(get_group_users(gid))
+                    self._members.put(gid, users)
+        return users
+
+    def forget_group(self, gid: int) -> None:
+        """Reverse map entry বাদ (অন্য process-এর write)."""
+        self._members.pop(int(gid), None)
+
+    def _apply(self, links=(), unlinks=()) -> None:
+        """Cache side of a write: links [(uid, gid, title)], unlinks [(uid, gid)]."""
+        with self._lock:
+            for uid, gid, title in links:
+                groups = self._cache.peek(uid)
+                if groups is not None:
+                    self._cache.put(uid, {**groups, gid: {"title": title or ""}})
+                users = self._members.peek(gid)
+                if users is not None and uid not in users:
+                    self._members.put(gid, users | {uid})
+            for uid, gid in unlinks:
+                groups = self._cache.peek(uid)
+                if groups is not None and gid in groups:
+                    self._cache.put(uid, {g: v for g, v in groups.items() if g != gid})
+                users = self._members.peek(gid)
+                if users is not None and uid in users:
+                    self._members.put(gid, users - {uid})
+
     # Persist a single mapping
     def connect(self, user_id: int, gid: int, title: str = ""):
-        set_user_group(int(user_id), int(gid), title or "")
-        # refresh cache row
-        self._cache[int(user_id)] = get_user_groups(int(user_id))
+        self.link_many([(user_id, gid, title)])
+
+    def disconnect(self, user_id: int, gid: int) -> None:
+        self.unlink_many([(user_id, gid)])
+
+    def link_many(self, rows) -> None:
+        """[(user_id, gid, title), ...] -> one transaction + cache update (re-query নেই)."""
+        rows = [(int(uid), int(gid), title or "") for uid, gid, title in rows]
+        link_user_groups(rows)
+        self._apply(links=rows)
+
+    def unlink_many(self, pairs) -> None:
+        pairs = [(int(uid), int(gid)) for uid, gid in pairs]
+        unlink_user_groups(pairs)
+        self._apply(unlinks=pairs)
+
+    def unlink_group(self, gid: int) -> list[int]:
+        """Bot removed from gid: every user's link goes (one DELETE). Returns affected user_ids."""
+        gid = int(gid)
+        uids = unlink_group(gid)
+        self._apply(unlinks=[(uid, gid) for uid in uids])
+        self._members.put(gid, frozenset())
+        return uids
+
+    def set_title(self, gid: int, title: str) -> None:
+        """Group renamed: DB rows + cached rows of the linked users only."""
+        gid = int(gid)
+        set_group_title(gid, title)
+        self._apply(links=[(uid, gid, title) for uid in self.users_of(gid) if uid in self._cache])
 
 USER_GROUPS = _UserGroups()
 
-# ---------- PM target helpers (persisted in DB) ----------
+# user_id -> selected gid (None = নেই); pm_targets table-এর read cache
+PM_TARGETS = LRUCache(USER_CACHE_SIZE)
+
+def cache_stats() -> dict:
+    """hit / miss / eviction counters of the group and user caches."""
+    return {"groups": GROUP_SETTINGS.stats(), "user_groups": USER_GROUPS.stats(),
+            "pm_targets": PM_TARGETS.stats()}
+
+metrics.register_collector(lambda: (
+    metrics.cache_rows("group_settings", GROUP_SETTINGS.stats())
+    + metrics.cache_rows("user_groups", USER_GROUPS.stats())
+    + metrics.cache_rows("pm_targets", PM_TARGETS.stats())
+))
+
+# ---------- Cross-process invalidation (BOT_PROCESSES > 1, দেখুন supervisor.py) ----------
+# অন্য worker কোনো group / user লিখলে (db.change_log) এখানে cache entry ফেলে দিই;
+# পরের access DB থেকে নতুন করে লোড করে। Lag <= BOT_SYNC_MS।
+SYNC_MS = int(os.environ.get("BOT_SYNC_MS", "200"))
+
+def _apply_changes(changes) -> None:
+    me = os.getpid()
+    for kind, key, pid in changes:
+        if pid == me:
+            continue
+        if kind == "g":
+            del GROUP_SETTINGS[key]
+        elif kind == "u":
+            del USER_GROUPS[key]
+        elif kind == "p":
+            PM_TARGETS.pop(key, None)
+        elif kind == "m":
+            USER_GROUPS.forget_group(key)
+        elif kind == "t":
+            for uid in USER_GROUPS.users_of(key):
+                del USER_GROUPS[uid]
+
+def _sync_loop() -> None:
+    ver = data_version()          # আগে version, তারপর head: মাঝের commit হারায় না
+    seq, n = change_log_head(), 0
+    while True:
+        time.sleep(SYNC_MS / 1000.0)
+        try:
+            v = data_version()
+            if v == ver:
+                continue
+            ver = v
+            seq, changes = read_changes(seq)
+            _apply_changes(changes)
+            n += len(changes)
+            if n >= 1000:
+                n = 0
+                prune_changes()
+        except Exception:
+            time.sleep(1)
+
+if CHANGE_LOG:
+    threading.Thread(target=_sync_loop, name="change-sync", daemon=True).start()
+
+# ---------- PM target helpers (pm_targets table + PM_TARGETS cache) ----------
 
 def set_pm_target(user_id: int, gid: int) -> None:
     """
     Save user's selected group (used by /filters_group).
+    Same value already cached -> no DB write.
     """
-    db_set_pm_target(int(user_id), int(gid))
+    user_id, gid = int(user_id), int(gid)
+    if PM_TARGETS.get(user_id, MISSING) == gid:
+        return
+    db_set_pm_target(user_id, gid)
+    PM_TARGETS.put(user_id, gid)
 
 def get_pm_target(user_id: int) -> int | None:
     """
     Load user's last-selected group for PM filter commands.
     """
+    user_id = int(user_id)
+    gid = PM_TARGETS.get(user_id, MISSING)
+    if gid is not MISSING:
+        return gid
     try:
-        return db_get_pm_target(int(user_id))
+        gid = db_get_pm_target(user_id)
     except Exception:
         return None
+    PM_TARGETS.put(user_id, gid)
+    return gid
 
 def clear_pm_target(user_id: int) -> None:
     """
@@ -124,7 +412,8 @@ def clear_pm_target(user_id: int) -> None:
     try:
         db_clear_pm_target(int(user_id))
     except Exception:
-        pass
+        return
+    PM_TARGETS.put(int(user_id), None)
 
 def ensure_pm_target(user_id: int) -> int | None:
     """
@@ -134,6 +423,6 @@ def ensure_pm_target(user_id: int) -> int | None:
     groups = USER_GROUPS[int(user_id)]
     if groups and len(groups) == 1:
         only_gid = next(iter(groups.keys()))
-        db_set_pm_target(int(user_id), int(only_gid))
+        set_pm_target(user_id, only_gid)
         return int(only_gid)
     return get_pm_target(int(user_id))
\ No newline at end of file
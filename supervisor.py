@@ -0,0 +1,199 @@
+# supervisor.py
+# BOT_PROCESSES=N (>1): একটা process update আনে (polling বা webhook), chat.id দেখে
+# N worker process-এর একটায় পাঠায় (stdin pipe, এক লাইনে এক update JSON)।
+# Worker = main.py নিজেই (BOT_WORKER_INDEX সেট থাকে), handler-রা অপরিবর্তিত।
+# সবাই একই WAL SQLite শেয়ার করে; cache invalidation: db.change_log + PRAGMA data_version (state.py)।
+from __future__ import annotations
+import json
+import logging
+import os
+import queue
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+logger = logging.getLogger("TeleBot")
+
+PROCESSES = int(os.environ.get("BOT_PROCESSES", "1"))
+WORKER_INDEX = os.environ.get("BOT_WORKER_INDEX")     # worker process-এ সেট থাকে
+IS_WORKER = WORKER_INDEX is not None
+
+_UPDATE_KINDS = (
+    "message", "edited_message", "callback_query", "chat_member", "my_chat_member",
+    "chat_join_request", "channel_post", "edited_channel_post",
+)
+_STOP = object()
+
+
+def route_key(update: dict) -> int:
+    """Raw update dict -> chat id (dispatch.chat_key-এর মতো; callback -> message.chat)."""
+    for kind in _UPDATE_KINDS:
+        obj = update.get(kind)
+        if not obj:
+            continue
+        chat = obj.get("chat") or (obj.get("message") or {}).get("chat")
+        if chat:
+            return int(chat["id"])
+        user = obj.get("from")
+        return int(user["id"]) if user else 0
+    return 0
+
+
+class _Worker:
+    """One child process + feeder thread; crashed child is restarted on the next write."""
+    def __init__(self, index: int, total: int, script: str):
+        self.index, self.total, self.script = index, total, script
+        self.q: queue.Queue = queue.Queue()
+        self.proc = None
+        self._spawn()
+        self._thread = threading.Thread(target=self._feed, name=f"feed-{index}", daemon=True)
+        self._thread.start()
+
+    def _env(self) -> dict:
+        env = dict(os.environ, BOT_WORKER_INDEX=str(self.index), BOT_PROCESSES=str(self.total))
+        # global send rate process-গুলোর মধ্যে ভাগ (outbox.py প্রতি process-এ আলাদা bucket রাখে)
+        env["BOT_GLOBAL_RATE"] = str(float(os.environ.get("BOT_GLOBAL_RATE", "30")) / self.total)
+        port = int(os.environ.get("BOT_METRICS_PORT", "0"))
+        if port:
+            env["BOT_METRICS_PORT"] = str(port + 1 + self.index)
+        if os.environ.get("BOT_METRICS_FILE"):
+            env["BOT_METRICS_FILE"] = f"{os.environ['BOT_METRICS_FILE']}.{self.index}"
+        return env
+
+    def _spawn(self) -> None:
+        self.proc = subprocess.Popen([sys.executable, self.script], stdin=subprocess.PIPE, env=self._env())
+        logger.info("worker %d started (pid %d)", self.index, self.proc.pid)
+
+    def _feed(self) -> None:
+        while True:
+            item = self.q.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            while not self.q.empty() and len(batch) < 100:
+                nxt = self.q.get_nowait()
+                if nxt is _STOP:
+                    self.q.put(_STOP)
+                    break
+                batch.append(nxt)
+            data = b"".join(batch)
+            for attempt in range(3):
+                if self.proc.poll() is not None:
+                    logger.error("worker %d exited (%s), restarting", self.index, self.proc.returncode)
+                    time.sleep(min(attempt, 2))
+                    self._spawn()
+                try:
+                    self.proc.stdin.write(data)
+                    self.proc.stdin.flush()
+                    break
+                except (BrokenPipeError, OSError):
+                    continue
+            else:
+                logger.error("worker %d: dropped %d updates", self.index, len(batch))
+
+    def put(self, line: bytes) -> None:
+        self.q.put(line)
+
+    def close(self, timeout: float = 30) -> None:
+        self.q.put(_STOP)
+        self._thread.join(timeout)
+        try:
+            self.proc.stdin.close()         # EOF -> worker বাকি কাজ শেষ করে বের হয়
+            self.proc.wait(timeout)
+        except Exception:
+            self.proc.kill()
+
+
+class Router:
+    def __init__(self, processes: int, script: str):
+        self.workers = [_Worker(i, processes, script) for i in range(processes)]
+
+    def dispatch(self, updates) -> None:
+        n = len(self.workers)
+        for u in updates:
+            line = json.dumps(u, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+            self.workers[route_key(u) % n].put(line)
+
+    def close(self) -> None:
+        for w in self.workers:
+            w.close()
+
+
+def _poll(token: str, router: Router, allowed_updates) -> None:
+    from telebot import apihelper
+    offset = None
+    while True:
+        try:
+            updates = apihelper.get_updates(token, offset=offset, limit=100, timeout=20,
+                                            allowed_updates=allowed_updates, long_polling_timeout=20)
+        except Exception as e:
+            logger.error("getUpdates failed: %r", e)
+            time.sleep(3)
+            continue
+        if updates:
+            offset = updates[-1]["update_id"] + 1
+            router.dispatch(updates)
+
+
+def _webhook(token: str, router: Router, allowed_updates) -> None:
+    from aiohttp import web
+    from telebot import apihelper
+    from webhook import WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_URL, WEBHOOK_SECRET, API_CONCURRENCY
+
+    async def on_update(request):
+        if WEBHOOK_SECRET and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET:
+            return web.Response(status=403)
+        try:
+            data = await request.json(loads=json.loads)
+        except Exception:
+            return web.Response(status=400)
+        router.dispatch([data])
+        return web.Response()
+
+    if WEBHOOK_URL:
+        apihelper.set_webhook(token, url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+                              secret_token=WEBHOOK_SECRET, allowed_updates=allowed_updates,
+                              max_connections=API_CONCURRENCY)
+    app = web.Application()
+    app.router.add_post(WEBHOOK_PATH, on_update)
+    web.run_app(app, host=WEBHOOK_HOST, port=WEBHOOK_PORT, print=None)
+
+
+def _on_term(*_):
+    raise KeyboardInterrupt
+
+
+def run(token: str, mode: str, processes: int, allowed_updates, script: str) -> None:
+    """Blocking supervisor: schema/migrations একবার, তারপর workers + update source।"""
+    from db import init_db
+    init_db()
+    router = Router(processes, script)
+    signal.signal(signal.SIGTERM, _on_term)
+    print(f"Supervisor: {processes} workers ({mode})")
+    try:
+        if mode == "webhook":
+            _webhook(token, router, allowed_updates)
+        else:
+            _poll(token, router, allowed_updates)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        router.close()
+
+
+def serve_worker(bot) -> None:
+    """Worker side: stdin থেকে update পড়ে bot-এ দিই; EOF (supervisor বন্ধ) হলে ফিরি।"""
+    from telebot import types
+    signal.signal(signal.SIGINT, signal.SIG_IGN)   # Ctrl+C supervisor সামলায়, আমরা EOF-এ থামি
+    for line in sys.stdin.buffer:
+        try:
+            update = types.Update.de_json(json.loads(line))
+        except Exception as e:
+            logger.error("bad update line: %r", e)
+            continue
+        bot.process_new_updates([update])
+    pool = getattr(bot, "worker_pool", None)
+    if pool is not None:
+        pool.close()
@@ -0,0 +1,107 @@
+# tgcache.py
+# Telegram metadata cache: get_me / get_chat / get_chat_member (TTL + negative cache).
+# chat_member / my_chat_member update এলে entry সরাসরি আপডেট হয়, group title-ও রিফ্রেশ হয়।
+import os
+
+from telebot.apihelper import ApiTelegramException
+
+import metrics
+from cache import TTLCache, MISSING
+from state import USER_GROUPS
+
+CHAT_TTL = float(os.environ.get("BOT_CHAT_TTL", "600"))
+MEMBER_TTL = float(os.environ.get("BOT_MEMBER_TTL", "300"))
+NEGATIVE_TTL = float(os.environ.get("BOT_NEGATIVE_TTL", "60"))
+
+_ME = None
+_CHATS = TTLCache(20000, CHAT_TTL)                 # chat_id -> Chat | ApiTelegramException
+_MEMBERS = TTLCache(100000, MEMBER_TTL)           # (chat_id, user_id) -> ChatMember | exc
+_TITLES = TTLCache(20000, 24 * 3600)              # gid -> last title written to user_groups
+_GONE = ("left", "kicked")
+_DEFINITIVE = (400, 403)                           # chat not found / bot kicked ইত্যাদি; 429 / 5xx নয়
+
+
+def _cached(cache: TTLCache, key, fetch):
+    val = cache.get(key, MISSING)
+    if val is MISSING:
+        try:
+            val = fetch()
+        except ApiTelegramException as e:
+            # Telegram-এর নিশ্চিত "না" (chat not found, ...) কিছুক্ষণ মনে রাখি; flood wait / server error না
+            if e.error_code in _DEFINITIVE:
+                cache.put(key, e, NEGATIVE_TTL)
+            raise
+        cache.put(key, val)
+    if isinstance(val, ApiTelegramException):
+        raise val
+    return val
+
+
+def get_me(bot):
+    global _ME
+    if _ME is None:
+        _ME = bot.get_me()
+    return _ME
+
+
+def bot_username(bot) -> str:
+    return get_me(bot).username
+
+
+def get_chat(bot, chat_id: int):
+    chat = _cached(_CHATS, int(chat_id), lambda: bot.get_chat(chat_id))
+    _note_title(chat_id, getattr(chat, "title", None))
+    return chat
+
+
+def get_chat_member(bot, chat_id: int, user_id: int):
+    return _cached(_MEMBERS, (int(chat_id), int(user_id)), lambda: bot.get_chat_member(chat_id, user_id))
+
+
+def invalidate_chat(chat_id: int) -> None:
+    _CHATS.pop(int(chat_id), None)
+
+
+def invalidate_member(chat_id: int, user_id: int) -> None:
+    _MEMBERS.pop((int(chat_id), int(user_id)), None)
+
+
+def _note_title(gid: int, title: str | None) -> None:
+    """Title বদলালে user_groups রিফ্রেশ (একই title বারবার লিখি না)."""
+    if not title:
+        return
+    gid = int(gid)
+    if _TITLES.get(gid) == title:
+        return
+    _TITLES.put(gid, title)
+    USER_GROUPS.set_title(gid, title)
+
+
+def stats() -> dict:
+    return {"chats": _CHATS.stats(), "members": _MEMBERS.stats()}
+
+metrics.register_collector(lambda: (
+    metrics.cache_rows("tg_chats", _CHATS.stats()) + metrics.cache_rows("tg_members", _MEMBERS.stats())
+))
+
+
+def register(bot):
+
+    @bot.chat_member_handler()
+    def _on_chat_member(u):
+        # নতুন status সরাসরি cache-এ (পরের is_user_admin কলে round trip লাগবে না)
+        _MEMBERS.put((u.chat.id, u.new_chat_member.user.id), u.new_chat_member)
+        _note_title(u.chat.id, u.chat.title)
+
+    @bot.my_chat_member_handler()
+    def _on_my_chat_member(u):
+        _MEMBERS.put((u.chat.id, u.new_chat_member.user.id), u.new_chat_member)
+        invalidate_chat(u.chat.id)
+        _note_title(u.chat.id, u.chat.title)
+        if u.chat.type not in ("group", "supergroup"):
+            return
+        # বট বের হলে ওই গ্রুপের সব user link এক DELETE-এ; কেউ অ্যাড করলে তাকে লিঙ্ক করি
+        if u.new_chat_member.status in _GONE:
+            USER_GROUPS.unlink_group(u.chat.id)
+        elif u.old_chat_member.status in _GONE and u.from_user and not u.from_user.is_bot:
+            USER_GROUPS.connect(u.from_user.id, u.chat.id, u.chat.title or str(u.chat.id))
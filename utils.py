@@ -1,35 +1,34 @@
 # utils.py
+import json
+import re
 from datetime import datetime
+from functools import lru_cache
 from urllib.parse import quote_plus
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
 from state import USER_GROUPS, GROUP_SETTINGS
+from settings import Section
+from tgcache import get_chat_member
 
 def is_user_admin(bot, chat_id: int, user_id: int) -> bool:
     try:
-        st = bot.get_chat_member(chat_id, user_id).status
+        st = get_chat_member(bot, chat_id, user_id).status
         return st in ("administrator", "creator")
     except Exception:
         return False
 
 def register_group_for_user(uid: int, gid: int, title: str):
-    USER_GROUPS.setdefault(uid, {})
-    USER_GROUPS[uid][gid] = {"title": title}
-    GROUP_SETTINGS.setdefault(gid, {
-        "antispam": True, "antiflood": True, "goodbye": False, "alphabets": False,
-        "captcha": False, "checks": False, "media": True, "porn": True, "warns": True,
-        "night": False, "link": True, "deleting": False,
-        "rules_url": "https://t.me/",
-        "welcome_cfg": {"enabled": True, "mode": "always", "delete_last": False,
-                        "text": "", "media": None, "buttons": []}
-    })
+    # group settings-এর default settings.DEFAULTS থেকে আসে; এখানে কপি করার কিছু নেই
+    USER_GROUPS.connect(uid, gid, title)      # write-through (DB + cache)
 
 def fmt_onoff(v: bool) -> str: return "✅" if v else "❌"
 
 def welcome_cfg(gid: int) -> dict:
-    return GROUP_SETTINGS.setdefault(gid, {}).setdefault("welcome_cfg", {
-        "enabled": True, "mode": "always", "delete_last": False,
-        "text": "", "media": None, "buttons": []
-    })
+    """Defaults + এই group-এর override, plain dict হিসেবে; key বদলালে পুরো section GROUP_SETTINGS-এ লেখা হয়"""
+    def save(value: dict) -> None:
+        g = GROUP_SETTINGS[gid]
+        g["welcome_cfg"] = value
+        GROUP_SETTINGS[gid] = g
+    return Section(GROUP_SETTINGS[gid]["welcome_cfg"], save)
 
 def render_buttons_kb(button_rows):
     kb = InlineKeyboardMarkup()
@@ -37,6 +36,19 @@ def render_buttons_kb(button_rows):
         kb.add(*[InlineKeyboardButton(t, url=u) for (t, u) in row])
     return kb
 
+def buttons_markup_json(button_rows, row_width: int = 3) -> str | None:
+    """
+    Same reply_markup as render_buttons_kb(...).to_json(), built once as a string
+    (telebot passes str reply_markup through as-is). row_width=3 = InlineKeyboardMarkup default.
+    """
+    kb = []
+    for row in button_rows or []:
+        btns = [{"text": t, "url": u} for (t, u) in row]
+        kb.extend(btns[i:i + row_width] for i in range(0, len(btns), row_width))
+    if not kb:
+        return None
+    return json.dumps({"inline_keyboard": kb}, ensure_ascii=False)
+
 # Url Buttons parser (supports Share:, rules)
 def parse_buttons_input(s: str, rules_url: str):
     rows = []
@@ -56,23 +68,67 @@ def parse_buttons_input(s: str, rules_url: str):
         if row: rows.append(row)
     return rows
 
+# ---- precompiled {VAR} templates ----
+TEMPLATE_VARS = frozenset({
+    "ID", "NAME", "SURNAME", "NAMESURNAME", "MENTION", "LANG",
+    "DATE", "TIME", "WEEKDAY", "USERNAME", "GROUPNAME", "RULES",
+})
+_TIME_VARS = frozenset({"DATE", "TIME", "WEEKDAY"})
+
+@lru_cache(maxsize=None)
+def _var_re(names: frozenset):
+    return re.compile(r"\{(" + "|".join(sorted(map(re.escape, names))) + r")\}")
+
+class Template:
+    """
+    Text split once into literals + variable names.
+    render(values) = one join; names = variables the text actually uses.
+    """
+    __slots__ = ("text", "names", "_lits", "_vars")
+
+    def __init__(self, text: str, names: frozenset = TEMPLATE_VARS):
+        self.text = text
+        self._lits, self._vars = [], []
+        pos = 0
+        for m in _var_re(names).finditer(text):
+            self._lits.append(text[pos:m.start()])
+            self._vars.append(m.group(1))
+            pos = m.end()
+        self._lits.append(text[pos:])
+        self.names = frozenset(self._vars)
+
+    def render(self, values: dict) -> str:
+        if not self._vars:
+            return self.text
+        lits = self._lits
+        out = [lits[0]]
+        for i, v in enumerate(self._vars, 1):
+            out.append(values[v]); out.append(lits[i])
+        return "".join(out)
+
+@lru_cache(maxsize=4096)
+def compile_template(text: str, names: frozenset = TEMPLATE_VARS) -> Template:
+    return Template(text, names)
+
 def substitute_vars(text: str, user, chat_title: str, rules_url: str):
-    now = datetime.now()
-    mention_html = f'<a href="tg://user?id={user.id}">{(user.first_name or "User")}</a>'
-    repl = {
-        "{ID}": str(user.id),
-        "{NAME}": user.first_name or "",
-        "{SURNAME}": user.last_name or "",
-        "{NAMESURNAME}": f"{user.first_name or ''} {user.last_name or ''}".strip(),
-        "{MENTION}": mention_html,
-        "{LANG}": user.language_code or "",
-        "{DATE}": now.strftime("%Y-%m-%d"),
-        "{TIME}": now.strftime("%H:%M"),
-        "{WEEKDAY}": now.strftime("%A"),
-        "{USERNAME}": (user.username and f"@{user.username}") or "",
-        "{GROUPNAME}": chat_title,
-        "{RULES}": rules_url,
-    }
-    for k, v in repl.items():
-        text = text.replace(k, v)
-    return text
+    tpl = compile_template(text)
+    need = tpl.names
+    if not need:
+        return text
+    repl = {}
+    if need & _TIME_VARS:
+        now = datetime.now()
+        repl["DATE"] = now.strftime("%Y-%m-%d")
+        repl["TIME"] = now.strftime("%H:%M")
+        repl["WEEKDAY"] = now.strftime("%A")
+    for k in need - _TIME_VARS:
+        if k == "ID": repl[k] = str(user.id)
+        elif k == "NAME": repl[k] = user.first_name or ""
+        elif k == "SURNAME": repl[k] = user.last_name or ""
+        elif k == "NAMESURNAME": repl[k] = f"{user.first_name or ''} {user.last_name or ''}".strip()
+        elif k == "MENTION": repl[k] = f'<a href="tg://user?id={user.id}">{(user.first_name or "User")}</a>'
+        elif k == "LANG": repl[k] = user.language_code or ""
+        elif k == "USERNAME": repl[k] = (user.username and f"@{user.username}") or ""
+        elif k == "GROUPNAME": repl[k] = chat_title
+        elif k == "RULES": repl[k] = rules_url
+    return tpl.render(repl)
@@ -0,0 +1,147 @@
+# webhook.py
+# BOT_MODE=webhook: aiohttp webhook server + AsyncTeleBot dispatcher.
+# Polling (main.py) ফোলব্যাক হিসেবে থাকে। Requires: aiohttp
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from telebot import types
+
+from dispatch import ShardedWorkerPool, chat_key
+
+WEBHOOK_HOST = os.environ.get("BOT_WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.environ.get("BOT_WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.environ.get("BOT_WEBHOOK_PATH", "/webhook")
+WEBHOOK_URL = os.environ.get("BOT_WEBHOOK_URL")          # public base URL; set হলে setWebhook করি
+WEBHOOK_SECRET = os.environ.get("BOT_WEBHOOK_SECRET")    # X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_WORKERS = int(os.environ.get("BOT_WEBHOOK_WORKERS", "32"))
+API_CONCURRENCY = int(os.environ.get("BOT_API_CONCURRENCY", "100"))
+
+
+class AsyncBridge:
+    """
+    TeleBot-compatible facade over AsyncTeleBot, so main.py / modules register unchanged:
+    - message_handler / callback_query_handler register async wrappers on AsyncTeleBot;
+      the handler body runs in a worker pool (DB / matching stay off the event loop)
+    - Bot API calls (reply_to, get_me, ...) are coroutines on the loop's aiohttp
+      session, so many calls are in flight at once
+    - shards > 0: handler bodies run on a per-chat ordered ShardedWorkerPool
+    """
+    def __init__(self, token: str, parse_mode: str | None = None, workers: int = WEBHOOK_WORKERS,
+                 shards: int = 0):
+        from telebot import asyncio_helper
+        from telebot.async_telebot import AsyncTeleBot
+        api_url = os.environ.get("BOT_API_URL")
+        if api_url:
+            asyncio_helper.API_URL = api_url
+        asyncio_helper.REQUEST_LIMIT = API_CONCURRENCY
+        self.abot = AsyncTeleBot(token, parse_mode=parse_mode)
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread: threading.Thread | None = None
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="handler")
+        self.worker_pool = ShardedWorkerPool(None, shards) if shards > 0 else None
+        self._tasks: set = set()
+
+    def _wrap(self, fn):
+        pool, sharded = self._pool, self.worker_pool
+
+        if sharded is not None:
+            async def handler(obj):
+                await asyncio.wrap_future(sharded.submit(chat_key(obj), fn, obj))
+        else:
+            async def handler(obj):
+                await asyncio.get_running_loop().run_in_executor(pool, fn, obj)
+        handler.__name__ = fn.__name__
+        return handler
+
+    def message_handler(self, *args, **kwargs):
+        def deco(fn):
+            self.abot.message_handler(*args, **kwargs)(self._wrap(fn))
+            return fn
+        return deco
+
+    def callback_query_handler(self, *args, **kwargs):
+        def deco(fn):
+            self.abot.callback_query_handler(*args, **kwargs)(self._wrap(fn))
+            return fn
+        return deco
+
+    def my_chat_member_handler(self, *args, **kwargs):
+        def deco(fn):
+            self.abot.my_chat_member_handler(*args, **kwargs)(self._wrap(fn))
+            return fn
+        return deco
+
+    def chat_member_handler(self, *args, **kwargs):
+        def deco(fn):
+            self.abot.chat_member_handler(*args, **kwargs)(self._wrap(fn))
+            return fn
+        return deco
+
+    def __getattr__(self, name):
+        attr = getattr(self.abot, name)
+        if not asyncio.iscoroutinefunction(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            loop = self.loop
+            if loop is None:
+                raise RuntimeError("webhook loop not running")
+            if threading.current_thread() is self._loop_thread:
+                raise RuntimeError(f"{name}() called from the event loop thread")
+            return asyncio.run_coroutine_threadsafe(attr(*args, **kwargs), loop).result()
+        return call
+
+    def feed(self, update: types.Update) -> None:
+        """Schedule an update on the loop (must be called from the loop)."""
+        t = asyncio.get_running_loop().create_task(self.abot.process_new_updates([update]))
+        self._tasks.add(t)
+        t.add_done_callback(self._tasks.discard)
+
+
+def run_webhook(bridge: AsyncBridge, allowed_updates=None, on_ready=None):
+    """Blocking: serve POST {WEBHOOK_PATH} until SIGINT/SIGTERM.
+    on_ready: blocking warm-up (get_me ইত্যাদি), loop চালু হওয়ার পরে আলাদা thread-এ চলে।"""
+    from aiohttp import web
+    # outbox.QueuedBot দিলে ভেতরের AsyncBridge-এ loop বসাতে হবে (wrapper-এ নয়)
+    bridge = vars(bridge).get("_bot", bridge)
+
+    async def on_update(request):
+        if WEBHOOK_SECRET and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET:
+            return web.Response(status=403)
+        try:
+            data = await request.json(loads=json.loads)
+            update = types.Update.de_json(data)
+        except Exception:
+            return web.Response(status=400)
+        bridge.feed(update)       # Telegram-কে সাথে সাথে 200, handling আলাদা task-এ
+        return web.Response()
+
+    async def on_startup(app):
+        bridge.loop = asyncio.get_running_loop()
+        bridge._loop_thread = threading.current_thread()
+        if WEBHOOK_URL:
+            await bridge.abot.set_webhook(
+                url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+                secret_token=WEBHOOK_SECRET,
+                allowed_updates=allowed_updates,
+                max_connections=API_CONCURRENCY,
+            )
+        if on_ready is not None:
+            threading.Thread(target=on_ready, name="webhook-ready", daemon=True).start()
+
+    async def on_cleanup(app):
+        if bridge._tasks:
+            await asyncio.gather(*list(bridge._tasks), return_exceptions=True)
+        await bridge.abot.close_session()
+        bridge._pool.shutdown(wait=True)
+        if bridge.worker_pool is not None:
+            bridge.worker_pool.close()
+
+    app = web.Application()
+    app.router.add_post(WEBHOOK_PATH, on_update)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    web.run_app(app, host=WEBHOOK_HOST, port=WEBHOOK_PORT, print=None)